@@ -15,7 +15,14 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
 """
-from .exporter import Exporter
+from .exporter import Exporter, ExportRegion
+from .exportqueue import ExportJob, ExportQueue
 from .log import Logger
 from .settings import Settings
 from .player import Player
+from .peaks import PeakPyramid
+from .fade import Fade
+from .pcmwave import PcmWave
+from .wavefile import WaveFile
+from .cache import WaveformCache
+from .waveform import WaveformGenerator
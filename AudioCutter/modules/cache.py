@@ -0,0 +1,309 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import threading
+from hashlib import sha256
+from os import path
+from tempfile import NamedTemporaryFile
+
+from gi.repository import Gio, GLib
+
+from .log import Logger
+from .settings import Settings
+from .wavefile import WaveFile
+from ..utils import get_uri_stat
+
+
+class WaveformCache:
+    """
+        Size-capped cache directory of the generated waveforms.
+        The modification time of the files is used as their last access
+        time, the least recently used ones are deleted in a background
+        thread once the cache grows over the size set in the settings.
+        Entries are keyed by a fingerprint of the media content, so moved
+        or copied files hit the cache and modified ones never do.
+        A URI to fingerprint index avoids reading the media on each lookup,
+        new URIs are appended to it and it's only rewritten, keeping the
+        most recently used ones, once it grew twice over MAX_INDEX_ENTRIES.
+    """
+    # Default instance of WaveformCache
+    instance = None
+    INDEX = "index.jsonl"
+    # Single JSON object index of the previous versions
+    LEGACY_INDEX = "index.json"
+    MAX_INDEX_ENTRIES = 4096
+    # Size and number of the blocks hashed to fingerprint a file
+    BLOCK_SIZE = 64 * 1024
+    BLOCKS = 5
+
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = path.join(GLib.get_user_cache_dir(), "AudioCutter")
+        self.directory = directory
+        if not path.exists(self.directory):
+            os.makedirs(self.directory)
+        self._lock = threading.Lock()
+        self._trimming = False
+        self._trim_again = False
+        self._entries = 0
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        # Lines of the index file, including the outdated ones
+        self._index_lines = 0
+        self._index = self._load_index()
+        self.trim()
+
+    @staticmethod
+    def get_default():
+        """Return the default instance of WaveformCache."""
+        if WaveformCache.instance is None:
+            WaveformCache.instance = WaveformCache()
+        return WaveformCache.instance
+
+    @property
+    def max_size(self):
+        """Maximum size of the cache, in bytes."""
+        return Settings.get_default().waveform_cache_size * 1024 * 1024
+
+    @property
+    def stats(self):
+        """Return the number of entries, their size, the hits and misses."""
+        with self._lock:
+            return {
+                "entries": self._entries,
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses
+            }
+
+    def get_location(self, key):
+        """Return the cache file location of a key."""
+        return path.join(self.directory, key)
+
+    def get_key(self, uri, source_size, source_mtime):
+        """
+            Return the content fingerprint of the media at uri.
+            It may read the whole media, so keep it off the main loop.
+        """
+        full_hash = Settings.get_default().waveform_cache_full_hash
+        with self._lock:
+            entry = self._index.pop(uri, None)
+            if entry is not None:
+                # Keep the recently used URIs last
+                self._index[uri] = entry
+        if entry and entry[:3] == [source_size, source_mtime, full_hash]:
+            return entry[3]
+        key = WaveformCache._compute_fingerprint(uri, source_size,
+                                                 full_hash)
+        with self._lock:
+            self._index[uri] = [source_size, source_mtime, full_hash, key]
+            self._append_index(uri)
+        return key
+
+    def lookup(self, uri, sample_duration):
+        """
+            Return the cached waveform of uri, None if missing or outdated,
+            with the (key, size, mtime) of the media to cache it under.
+        """
+        source_size, source_mtime = get_uri_stat(uri)
+        key = self.get_key(uri, source_size, source_mtime)
+        return self._open(key, sample_duration, source_size), \
+            (key, source_size, source_mtime)
+
+    def open(self, uri, sample_duration):
+        """Return the cached waveform of uri, None if missing or outdated."""
+        return self.lookup(uri, sample_duration)[0]
+
+    def _open(self, key, sample_duration, source_size):
+        location = self.get_location(key)
+        wavefile = WaveFile.open(location)
+        if wavefile and not wavefile.is_up_to_date(sample_duration,
+                                                   source_size):
+            wavefile = None
+        with self._lock:
+            if wavefile:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if wavefile:
+            # Mark the entry as recently used
+            try:
+                os.utime(location)
+            except OSError:
+                pass
+        return wavefile
+
+    def save(self, key, samples, sample_duration, source_size, source_mtime):
+        """Add a waveform to the cache, key being the media fingerprint."""
+        location = self.get_location(key)
+        try:
+            previous_size = os.stat(location).st_size
+        except OSError:
+            previous_size = None
+        encoding = Settings.get_default().waveform_cache_encoding
+        WaveFile.save(location, samples, sample_duration,
+                      source_size, source_mtime,
+                      WaveFile.ENCODINGS.get(encoding,
+                                             WaveFile.ENCODING_FLOAT32))
+        size = os.stat(location).st_size
+        with self._lock:
+            if previous_size is None:
+                self._entries += 1
+                self._bytes += size
+            else:
+                self._bytes += size - previous_size
+            over_size = self._bytes > self.max_size
+        if over_size or self._trimming:
+            self.trim()
+
+    def trim(self):
+        """Evict the least recently used entries in a background thread."""
+        with self._lock:
+            if self._trimming:
+                # Scan again once the running trim is done
+                self._trim_again = True
+                return
+            self._trimming = True
+        thread = threading.Thread(target=self._run_trim, daemon=True)
+        thread.start()
+
+    def _run_trim(self):
+        while True:
+            with self._lock:
+                self._trim_again = False
+            self._trim(self.max_size)
+            with self._lock:
+                if not self._trim_again:
+                    self._trimming = False
+                    return
+
+    def _trim(self, max_size):
+        entries = []
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                # Skip the index and the files being written
+                if not entry.is_file() or entry.name.startswith("tmp") or \
+                        entry.name.startswith("index."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        evicted = set()
+        for _, size, location in entries:
+            if total <= max_size:
+                break
+            try:
+                os.remove(location)
+            except OSError:
+                continue
+            total -= size
+            evicted.add(path.basename(location))
+        if evicted:
+            Logger.debug("[WaveformCache] Evicted {} waveforms".format(
+                len(evicted)))
+        with self._lock:
+            self._entries = len(entries) - len(evicted)
+            self._bytes = total
+            if evicted:
+                self._index = {uri: entry
+                               for uri, entry in self._index.items()
+                               if entry[3] not in evicted}
+                self._save_index()
+
+    def _load_index(self):
+        """Read the index, one [uri, size, mtime, full hash, key] per line."""
+        try:
+            os.remove(path.join(self.directory, WaveformCache.LEGACY_INDEX))
+        except OSError:
+            pass
+        index = {}
+        try:
+            with open(path.join(self.directory, WaveformCache.INDEX)) as lines:
+                for line in lines:
+                    try:
+                        uri, *entry = json.loads(line)
+                    except ValueError:
+                        # Torn by a crash while it was appended
+                        continue
+                    index.pop(uri, None)
+                    index[uri] = entry
+                    self._index_lines += 1
+        except OSError:
+            pass
+        if self._index_lines > 2 * WaveformCache.MAX_INDEX_ENTRIES:
+            self._save_index(index)
+        return index
+
+    def _append_index(self, uri):
+        # Called with the lock held
+        if self._index_lines >= 2 * WaveformCache.MAX_INDEX_ENTRIES:
+            self._save_index()
+            return
+        try:
+            with open(path.join(self.directory, WaveformCache.INDEX),
+                      "a") as index:
+                index.write(json.dumps([uri] + self._index[uri]) + "\n")
+            self._index_lines += 1
+        except OSError:
+            pass
+
+    def _save_index(self, index=None):
+        """Rewrite the index with its most recently used entries."""
+        # Called with the lock held, or from __init__
+        if index is None:
+            index = self._index
+        uris = list(index)[-WaveformCache.MAX_INDEX_ENTRIES:]
+        for uri in list(index)[:-WaveformCache.MAX_INDEX_ENTRIES]:
+            del index[uri]
+        with NamedTemporaryFile("w", dir=self.directory,
+                                delete=False) as lines:
+            for uri in uris:
+                lines.write(json.dumps([uri] + index[uri]) + "\n")
+        os.replace(lines.name, path.join(self.directory, WaveformCache.INDEX))
+        self._index_lines = len(uris)
+
+    @staticmethod
+    def _compute_fingerprint(uri, size, full_hash):
+        """Hash the size and a few blocks, or all, of the media content."""
+        digest = sha256(str(size).encode("utf-8"))
+        block_size = WaveformCache.BLOCK_SIZE
+        try:
+            stream = Gio.File.new_for_uri(uri).read(None)
+            if full_hash:
+                data = stream.read_bytes(block_size, None).get_data()
+                while data:
+                    digest.update(data)
+                    data = stream.read_bytes(block_size, None).get_data()
+            else:
+                last = max(0, size - block_size)
+                for i in range(WaveformCache.BLOCKS):
+                    offset = last * i // (WaveformCache.BLOCKS - 1)
+                    stream.seek(offset, GLib.SeekType.SET, None)
+                    digest.update(stream.read_bytes(block_size,
+                                                    None).get_data())
+            stream.close(None)
+        except GLib.Error:
+            # Unreadable media, fall back to the URI
+            digest.update(uri.encode("utf-8"))
+        return digest.hexdigest()
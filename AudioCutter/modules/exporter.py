@@ -15,18 +15,822 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
 """
+import os
+import threading
+from gettext import gettext as _
 
+import numpy
+from gi import require_version
+require_version('Gst', '1.0')
+require_version('GstAudio', '1.0')
+require_version('GstPbutils', '1.0')
+from gi.repository import Gio, GLib, GObject, Gst, GstAudio, GstPbutils
 
-class Exporter:
+from .fade import Fade
+from .log import Logger
+from .pcmwave import PcmWave
+from .settings import Settings
 
 
+class ExportRegion:
+    """A range of the source, exported with its own fades to its own file."""
+
+    def __init__(self, start_time, end_time, output, audio_format,
+                 is_fade_in=False, is_fade_out=False):
+        # Times are in seconds, an end before the start means up to the end
+        self.start_time = start_time
+        self.end_time = end_time
+        self.output = output
+        self.audio_format = audio_format
+        self.is_fade_in = is_fade_in
+        self.is_fade_out = is_fade_out
+        # Set once the branch of the region got all of its audio
+        self.done = False
+
+    @property
+    def start(self):
+        """Start of the region, in ns."""
+        return int(self.start_time * Gst.SECOND)
+
+    @property
+    def end(self):
+        """End of the region in ns, None up to the end."""
+        if self.end_time <= self.start_time:
+            return None
+        return int(self.end_time * Gst.SECOND)
+
+    @property
+    def fade_duration(self):
+        """Duration of the fades in ns, at most half the region."""
+        if self.end is None:
+            return Exporter.FADE_DURATION
+        return min(Exporter.FADE_DURATION, (self.end - self.start) // 2)
+
+
+class FadeFilter(Gst.Element):
+    """
+        Fade the audio of a region in and/or out.
+        Buffers outside of the fade windows are pushed untouched, the
+        others are pushed as faded copies, Python can't write to them.
+    """
+    __gstmetadata__ = ("Fade", "Filter/Effect/Audio",
+                       "Fade the audio of an exported region in and out",
+                       "Bilal Elmoussaoui")
+    # caps format: NumPy type of its samples
+    FORMATS = {"U8": "u1", "S16LE": "<i2", "S32LE": "<i4",
+               "F32LE": "<f4", "F64LE": "<f8"}
+    CAPS = "audio/x-raw,format={{{}}},layout=interleaved".format(
+        ",".join(FORMATS))
+    SRC_TEMPLATE = Gst.PadTemplate.new("src", Gst.PadDirection.SRC,
+                                       Gst.PadPresence.ALWAYS,
+                                       Gst.Caps.from_string(CAPS))
+    SINK_TEMPLATE = Gst.PadTemplate.new("sink", Gst.PadDirection.SINK,
+                                        Gst.PadPresence.ALWAYS,
+                                        Gst.Caps.from_string(CAPS))
+    __gsttemplates__ = (SRC_TEMPLATE, SINK_TEMPLATE)
+
+    def __init__(self, region, curve, end=None):
+        """end is the end of the source in ns, used if the region has none."""
+        Gst.Element.__init__(self)
+        self._region = region
+        self._curve = curve
+        self._end = end
+        # Built once the format of the audio is known
+        self._fade = None
+        self._dtype = None
+        self._info = None
+        self._segment = None
+        self._sinkpad = Gst.Pad.new_from_template(FadeFilter.SINK_TEMPLATE,
+                                                  "sink")
+        self._sinkpad.set_chain_function_full(self._chain_cb, None)
+        self._sinkpad.set_event_function_full(self._event_cb, None)
+        self._srcpad = Gst.Pad.new_from_template(FadeFilter.SRC_TEMPLATE,
+                                                 "src")
+        # The format goes through as is, let the peers negotiate it
+        flags = Gst.PadFlags.PROXY_CAPS | Gst.PadFlags.PROXY_ALLOCATION
+        for pad in (self._sinkpad, self._srcpad):
+            pad.set_flags(flags)
+            self.add_pad(pad)
+
+    def _to_frames(self, duration):
+        return int(round(duration * self._info.rate / Gst.SECOND))
+
+    def _set_caps(self, caps):
+        info = GstAudio.AudioInfo.new()
+        if not info.from_caps(caps):
+            return False
+        audio_format = caps.get_structure(0).get_string("format")
+        self._dtype = numpy.dtype(FadeFilter.FORMATS[audio_format])
+        self._info = info
+        region = self._region
+        end = region.end
+        if end is None:
+            end = self._end
+        if end is None:
+            success, duration = self._sinkpad.peer_query_duration(
+                Gst.Format.TIME)
+            if success:
+                end = duration
+        length = None
+        if end is not None:
+            length = self._to_frames(end - region.start)
+        elif region.is_fade_out:
+            Logger.warning("[FadeFilter] Unknown duration, can't fade out")
+        fade = self._to_frames(region.fade_duration)
+        self._fade = Fade(length, fade if region.is_fade_in else 0,
+                          fade if region.is_fade_out else 0, self._curve)
+        return True
+
+    def _event_cb(self, pad, parent, event):
+        if event.type == Gst.EventType.CAPS:
+            if not self._set_caps(event.parse_caps()):
+                return False
+        elif event.type == Gst.EventType.SEGMENT:
+            self._segment = event.parse_segment()
+        return pad.event_default(parent, event)
+
+    def _chain_cb(self, pad, parent, buffer):
+        faded = self._fade_buffer(buffer)
+        if faded is None:
+            return self._srcpad.push(buffer)
+        return self._srcpad.push(faded)
+
+    def _fade_buffer(self, buffer):
+        """Return a faded copy of buffer, None if it's not faded."""
+        if self._fade is None or self._segment is None or \
+                buffer.pts == Gst.CLOCK_TIME_NONE:
+            return None
+        position = self._segment.to_stream_time(Gst.Format.TIME, buffer.pts)
+        if position == Gst.CLOCK_TIME_NONE:
+            return None
+        first = self._to_frames(position - self._region.start)
+        count = buffer.get_size() // self._info.bpf
+        if not self._fade.is_faded(first, count):
+            return None
+        success, map_info = buffer.map(Gst.MapFlags.READ)
+        if not success:
+            return None
+        try:
+            samples = numpy.frombuffer(map_info.data, dtype=self._dtype,
+                                       count=count * self._info.channels)
+            data = self._fade.apply(samples.reshape(-1, self._info.channels),
+                                    first).tobytes()
+        finally:
+            buffer.unmap(map_info)
+        faded = Gst.Buffer.new_wrapped(data)
+        faded.pts = buffer.pts
+        faded.dts = buffer.dts
+        faded.duration = buffer.duration
+        faded.offset = buffer.offset
+        faded.offset_end = buffer.offset_end
+        return faded
+
+
+class ClipFilter(Gst.Element):
+    """
+        Cut the audio to its segment, to the sample.
+        Not every encoder does, wavenc writes every sample it gets.
+    """
+    __gstmetadata__ = ("Clip", "Filter/Audio",
+                       "Cut the audio to its segment",
+                       "Bilal Elmoussaoui")
+    CAPS = "audio/x-raw,layout=interleaved"
+    SRC_TEMPLATE = Gst.PadTemplate.new("src", Gst.PadDirection.SRC,
+                                       Gst.PadPresence.ALWAYS,
+                                       Gst.Caps.from_string(CAPS))
+    SINK_TEMPLATE = Gst.PadTemplate.new("sink", Gst.PadDirection.SINK,
+                                        Gst.PadPresence.ALWAYS,
+                                        Gst.Caps.from_string(CAPS))
+    __gsttemplates__ = (SRC_TEMPLATE, SINK_TEMPLATE)
+
+    def __init__(self):
+        Gst.Element.__init__(self)
+        self._info = None
+        self._segment = None
+        self._sinkpad = Gst.Pad.new_from_template(ClipFilter.SINK_TEMPLATE,
+                                                  "sink")
+        self._sinkpad.set_chain_function_full(self._chain_cb, None)
+        self._sinkpad.set_event_function_full(self._event_cb, None)
+        self._srcpad = Gst.Pad.new_from_template(ClipFilter.SRC_TEMPLATE,
+                                                 "src")
+        flags = Gst.PadFlags.PROXY_CAPS | Gst.PadFlags.PROXY_ALLOCATION
+        for pad in (self._sinkpad, self._srcpad):
+            pad.set_flags(flags)
+            self.add_pad(pad)
+
+    def _event_cb(self, pad, parent, event):
+        if event.type == Gst.EventType.CAPS:
+            info = GstAudio.AudioInfo.new()
+            if not info.from_caps(event.parse_caps()):
+                return False
+            self._info = info
+        elif event.type == Gst.EventType.SEGMENT:
+            self._segment = event.parse_segment()
+        return pad.event_default(parent, event)
+
+    def _chain_cb(self, pad, parent, buffer):
+        if self._info is None or self._segment is None:
+            return self._srcpad.push(buffer)
+        clipped = GstAudio.audio_buffer_clip(buffer, self._segment,
+                                             self._info.rate,
+                                             self._info.bpf)
+        if clipped is None:
+            # All out of the segment
+            return Gst.FlowReturn.OK
+        return self._srcpad.push(clipped)
+
+
+class Exporter(GObject.GObject):
+    """
+        Cut, fade and encode the opened audio file.
+        Everything runs in a streaming GStreamer pipeline, only the
+        selected range is decoded and the audio is never held in memory.
+        Several regions, or the same one to several formats, are decoded
+        at once and split with a tee, each encoder in its own thread.
+        Cuts without fades to the format of the source copy its packets,
+        and WAV to WAV cuts copy its bytes.
+        Long WAV exports can be decoded in chunks by parallel pipelines,
+        their frames are then joined behind a single header.
+    """
+    __gsignals__ = {
+        'progress': (GObject.SignalFlags.RUN_FIRST, None, (float, )),
+        'finished': (GObject.SignalFlags.RUN_FIRST, None, ()),
+        'error': (GObject.SignalFlags.RUN_FIRST, None, (str, ))
+    }
+
+    # mimetype: (file extension, container caps, audio caps)
+    PROFILES = {
+        "audio/ogg": ("ogg", "application/ogg", "audio/x-vorbis"),
+        "audio/x-wav": ("wav", "audio/x-wav", "audio/x-raw"),
+        "audio/aac": ("aac", None,
+                      "audio/mpeg,mpegversion=4,stream-format=adts"),
+        "audio/mpeg": ("mp3", None, "audio/mpeg,mpegversion=1,layer=3"),
+        "audio/3gpp": ("3gp", "video/quicktime,variant=3gpp", "audio/AMR"),
+        "audio/3gpp2": ("3g2", "video/quicktime,variant=3gpp",
+                        "audio/mpeg,mpegversion=4"),
+        "audio/webm": ("webm", "audio/webm", "audio/x-opus")
+    }
+    # Containers an elementary stream can be found in
+    TAG_CONTAINERS = "application/x-id3; application/x-apetag"
+    # Formats whose chunks join without a gap, encoders add their
+    # delay and padding to each chunk of the others
+    CHUNK_FORMATS = ("audio/x-wav", )
+    # Shortest range decoded by a chunk of a long export
+    CHUNK_DURATION = 10 * 60 * Gst.SECOND
+    FADE_DURATION = 3 * Gst.SECOND
+    # Interval in ms between two progress signals
+    PROGRESS_INTERVAL = 250
+
     def __init__(self, *args, **kwargs):
-        self._start_time = kwargs.get("start_time", 0)
-        self._end_time = kwargs.get("end_time", 0)
-        self._is_fade_in = kwargs.get("is_fade_in", False)
-        self._is_fade_out = kwargs.get("is_fade_out", False)
-        self._audio_format = kwargs.get("audio_format", "")
+        GObject.GObject.__init__(self)
         self._audio_path = kwargs.get("path", "")
+        # GstPbutils.DiscovererInfo of the source, to detect its format
+        self._info = kwargs.get("info", None)
+        self._regions = kwargs.get("regions", None)
+        if self._regions is None:
+            output = kwargs.get("output", "")
+            audio_formats = list(kwargs.get(
+                "audio_formats", [kwargs.get("audio_format", "")]))
+            if len(audio_formats) > 1:
+                outputs = [Exporter.get_output(output, audio_format)
+                           for audio_format in audio_formats]
+            else:
+                outputs = [output]
+            # The same selection encoded to each format from one decode
+            self._regions = [
+                ExportRegion(kwargs.get("start_time", 0),
+                             kwargs.get("end_time", 0),
+                             output, audio_format,
+                             kwargs.get("is_fade_in", False),
+                             kwargs.get("is_fade_out", False))
+                for output, audio_format in zip(outputs, audio_formats)]
+        self._pipeline = None
+        self._sinkpad = None
+        # Set to stop a running WAV copy or join of the chunks
+        self._cancelled = None
+        # Exporters of the chunks of a long export, with their progress
+        self._chunks = []
+        self._chunks_progress = []
+        # Most pipelines a long export may be split in
+        self.max_chunks = kwargs.get("max_chunks", os.cpu_count() or 1)
+        self._curve = Settings.get_default().fade_curve
+        self._seek_requested = False
+        self._segment = None
+        self._position = 0
+        self._progress_id = 0
+
+    @staticmethod
+    def get_extension(audio_format):
+        """Return the file extension of a mimetype, empty if unsupported."""
+        return Exporter.PROFILES.get(audio_format, ("", ))[0]
+
+    @staticmethod
+    def get_output(output, audio_format):
+        """Return the output path with the extension of a mimetype."""
+        root, extension = os.path.splitext(output)
+        if extension[1:] in (profile[0] for profile in
+                             Exporter.PROFILES.values()):
+            output = root
+        return "{}.{}".format(output, Exporter.get_extension(audio_format))
+
+    @property
+    def regions(self):
+        return self._regions
+
+    @property
+    def start(self):
+        """Start of the decoded range, in ns."""
+        return min(region.start for region in self._regions)
+
+    @property
+    def end(self):
+        """End of the decoded range in ns, None up to the end."""
+        ends = [region.end for region in self._regions]
+        if None in ends:
+            return None
+        return max(ends)
+
+    @property
+    def outputs(self):
+        return [region.output for region in self._regions]
+
+    @property
+    def n_pipelines(self):
+        """Number of pipelines running the export at the same time."""
+        return max(len(self._chunks), 1)
+
+    @property
+    def is_running(self):
+        return self._pipeline is not None or self._cancelled is not None \
+            or bool(self._chunks)
 
     def do(self):
-        pass
\ No newline at end of file
+        """Start the export, its outcome is signalled from the main loop."""
+        for region in self._regions:
+            if region.audio_format not in Exporter.PROFILES:
+                self.emit("error",
+                          _("Exporting to {} is not supported").format(
+                              region.audio_format))
+                return
+        output = self._get_source_output()
+        if output is not None:
+            # Writing it would truncate the audio still being read
+            self.emit("error",
+                      _("Can't export over the source file {}").format(
+                          output))
+            return
+        Logger.debug("[Exporter] Exporting {} to {}".format(
+            self._audio_path,
+            ", ".join(self.outputs)))
+        wave = self._open_pcm_wave()
+        if wave is not None:
+            self._cancelled = threading.Event()
+            threading.Thread(target=self._copy_wave,
+                             args=(wave, self._cancelled),
+                             daemon=True).start()
+            return
+        chunks = self._get_chunks()
+        if chunks:
+            self._export_chunks(chunks)
+            return
+        self._pipeline = Gst.Pipeline.new("exporter")
+        decode = Gst.ElementFactory.make("uridecodebin", "decode")
+        decode.props.uri = self._audio_path
+        decode.connect("pad-added", self._pad_added_cb)
+        self._pipeline.add(decode)
+        if self._can_stream_copy():
+            Logger.debug("[Exporter] Copying the packets of {}".format(
+                self._audio_path))
+            # Stop autoplugging at the parsed packets, encodebin passes
+            # them through when they match its profile
+            region = self._regions[0]
+            _, _, audio = Exporter.PROFILES[region.audio_format]
+            decode.props.caps = Gst.Caps.from_string(audio)
+            self._sinkpad = self._add_encoder(region)
+        else:
+            decode.props.caps = Gst.Caps.from_string("audio/x-raw")
+            convert = Gst.ElementFactory.make("audioconvert", None)
+            tee = Gst.ElementFactory.make("tee", None)
+            for element in (convert, tee):
+                self._pipeline.add(element)
+            convert.link(tee)
+            self._sinkpad = convert.get_static_pad("sink")
+            for region in self._regions:
+                self._add_branch(tee, region)
+        self._sinkpad.add_probe(
+            Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM,
+            self._position_probe_cb)
+
+        bus = self._pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message::eos", self._eos_cb)
+        bus.connect("message::error", self._error_cb)
+        result = self._pipeline.set_state(Gst.State.PLAYING)
+        if result == Gst.StateChangeReturn.FAILURE:
+            self._fail(_("Could not start the export"))
+            return
+        self._progress_id = GLib.timeout_add(Exporter.PROGRESS_INTERVAL,
+                                             self._progress_cb)
+
+    def cancel(self):
+        """Stop a running export and remove what was written of it."""
+        if self._cancelled is not None:
+            # The copy thread removes its outputs once stopped
+            self._cancelled.set()
+            self._cancelled = None
+        elif self._chunks:
+            Logger.debug("[Exporter] Export of {} cancelled".format(
+                self._audio_path))
+            for exporter in self._chunks:
+                exporter.cancel()
+                # Including the outputs of the chunks already done
+                exporter._remove_outputs()
+            self._chunks = []
+        elif self._pipeline is not None:
+            Logger.debug("[Exporter] Export of {} cancelled".format(
+                self._audio_path))
+            self._teardown()
+            self._remove_outputs()
+
+    def _get_source_output(self):
+        """Return the output that is the source file, if any."""
+        filename = Gio.File.new_for_uri(self._audio_path).get_path()
+        if filename is None:
+            return None
+        for output in self.outputs:
+            try:
+                if os.path.samefile(filename, output):
+                    return output
+            except OSError:
+                # Not written yet
+                continue
+        return None
+
+    def _add_encoder(self, region):
+        """Add the encoder and file sink of a region, return its sink pad."""
+        encode = Gst.ElementFactory.make("encodebin", None)
+        encode.props.profile = self._get_profile(region.audio_format)
+        sink = Gst.ElementFactory.make("filesink", None)
+        sink.props.location = region.output
+        for element in (encode, sink):
+            self._pipeline.add(element)
+        encode.link(sink)
+        return encode.get_request_pad("audio_%u")
+
+    def _add_branch(self, tee, region):
+        """Fade and encode a region in its own thread, behind the tee."""
+        branch = Gst.parse_bin_from_description(
+            "queue ! audioresample ! audioconvert", True)
+        elements = [branch]
+        # wavenc writes every sample it gets, even out of the segment
+        if self._is_split() or region.audio_format == "audio/x-wav":
+            elements.append(ClipFilter())
+        if region.is_fade_in or region.is_fade_out:
+            end = None
+            if self._info is not None:
+                end = self._info.get_duration()
+            # Faded in the format the encoder takes, if it can
+            elements.append(FadeFilter(region, self._curve, end))
+        for element in elements:
+            self._pipeline.add(element)
+        for element, next_element in zip(elements, elements[1:]):
+            element.link(next_element)
+        elements[-1].get_static_pad("src").link(self._add_encoder(region))
+        pad = tee.get_request_pad("src_%u")
+        pad.link(branch.get_static_pad("sink"))
+        if self._is_split():
+            pad.add_probe(
+                Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM,
+                self._region_probe_cb, region)
+
+    def _is_split(self):
+        """Whether the regions cover different ranges of the source."""
+        return len(set((region.start, region.end)
+                       for region in self._regions)) > 1
+
+    def _region_probe_cb(self, pad, info, region):
+        """Only let the audio of the region through to its branch."""
+        if info.type & Gst.PadProbeType.BUFFER:
+            buffer = info.get_buffer()
+            if region.done or self._segment is None:
+                return Gst.PadProbeReturn.DROP
+            start = self._segment.to_stream_time(Gst.Format.TIME,
+                                                 buffer.pts)
+            if start + buffer.duration <= region.start:
+                return Gst.PadProbeReturn.DROP
+            if region.end is not None and start >= region.end:
+                region.done = True
+                pad.get_peer().send_event(Gst.Event.new_eos())
+                return Gst.PadProbeReturn.DROP
+            return Gst.PadProbeReturn.OK
+        event = info.get_event()
+        if event.type == Gst.EventType.SEGMENT:
+            # Start the branch at the region, its ClipFilter cuts the
+            # buffers overlapping the edges
+            segment = event.parse_segment()
+            segment.start = max(segment.start,
+                                segment.position_from_stream_time(
+                                    Gst.Format.TIME, region.start))
+            segment.time = max(segment.time, region.start)
+            segment.position = segment.start
+            if region.end is not None:
+                segment.stop = segment.position_from_stream_time(
+                    Gst.Format.TIME, region.end)
+            pad.get_peer().send_event(Gst.Event.new_segment(segment))
+            return Gst.PadProbeReturn.DROP
+        if event.type == Gst.EventType.EOS and region.done:
+            return Gst.PadProbeReturn.DROP
+        return Gst.PadProbeReturn.OK
+
+    def _open_pcm_wave(self):
+        """Return the PcmWave source of WAV to WAV cuts, if they are."""
+        if any(region.audio_format != "audio/x-wav"
+               for region in self._regions):
+            return None
+        filename = Gio.File.new_for_uri(self._audio_path).get_path()
+        if filename is None:
+            return None
+        wave = PcmWave.open(filename)
+        is_faded = any(region.is_fade_in or region.is_fade_out
+                       for region in self._regions)
+        if wave is not None and wave.dtype is None and is_faded:
+            # Those samples can only be faded once decoded
+            wave.close()
+            return None
+        return wave
+
+    def _copy_wave(self, wave, cancelled):
+        """Copy the frames of each region of a WAV file, in a thread."""
+        error = None
+        try:
+            for index, region in enumerate(self._regions):
+                first = wave.get_frame(region.start)
+                last = wave.n_frames if region.end is None else \
+                    wave.get_frame(region.end)
+                fade = region.fade_duration * wave.rate // Gst.SECOND
+                wave.cut(region.output, first, last,
+                         fade if region.is_fade_in else 0,
+                         fade if region.is_fade_out else 0,
+                         lambda progress: GLib.idle_add(
+                             self._wave_progress_cb,
+                             (index + progress) / len(self._regions),
+                             cancelled),
+                         cancelled.is_set, self._curve)
+                if cancelled.is_set():
+                    break
+        except OSError as exception:
+            error = exception.strerror
+        finally:
+            wave.close()
+        if cancelled.is_set() or error is not None:
+            self._remove_outputs()
+        GLib.idle_add(self._wave_copied_cb, error, cancelled)
+
+    def _wave_progress_cb(self, progress, cancelled):
+        if not cancelled.is_set():
+            self.emit("progress", progress)
+        return False
+
+    def _wave_copied_cb(self, error, cancelled):
+        if cancelled.is_set():
+            return False
+        self._cancelled = None
+        if error is not None:
+            Logger.error("[Exporter] Copy Error: {}".format(error))
+            self.emit("error", error)
+        else:
+            Logger.debug("[Exporter] Export of {} done".format(
+                self._audio_path))
+            self.emit("progress", 1.0)
+            self.emit("finished")
+        return False
+
+    def _get_chunks(self):
+        """Split a long export in regions decoded in parallel, if it can."""
+        if not Settings.get_default().split_long_exports:
+            return []
+        if self._info is None or len(self._regions) != 1:
+            return []
+        region = self._regions[0]
+        if region.audio_format not in Exporter.CHUNK_FORMATS or \
+                self._can_stream_copy():
+            return []
+        end = region.end
+        if end is None:
+            end = self._info.get_duration()
+        count = min(self.max_chunks,
+                    (end - region.start) // Exporter.CHUNK_DURATION)
+        if count < 2:
+            return []
+        bounds = [region.start + (end - region.start) * index // count
+                  for index in range(count + 1)]
+        chunks = []
+        for index in range(count):
+            # Each chunk is a WAV file of its own until they are joined
+            output = "{}.{}.part".format(region.output, index)
+            end_time = bounds[index + 1] / Gst.SECOND
+            is_first, is_last = index == 0, index == count - 1
+            if is_last:
+                end_time = region.end_time
+            chunks.append(ExportRegion(bounds[index] / Gst.SECOND, end_time,
+                                       output, region.audio_format,
+                                       region.is_fade_in and is_first,
+                                       region.is_fade_out and is_last))
+        return chunks
+
+    def _export_chunks(self, chunks):
+        """Decode each chunk in its own pipeline, all at the same time."""
+        Logger.debug("[Exporter] Decoding {} in {} chunks".format(
+            self._audio_path, len(chunks)))
+        self._chunks_progress = [0.0] * len(chunks)
+        for index, chunk in enumerate(chunks):
+            exporter = Exporter(path=self._audio_path, info=self._info,
+                                regions=[chunk], max_chunks=1)
+            exporter.connect("progress", self._chunk_progress_cb, index)
+            exporter.connect("finished", self._chunk_finished_cb)
+            exporter.connect("error", self._chunk_error_cb)
+            self._chunks.append(exporter)
+        for exporter in list(self._chunks):
+            # A chunk failing to start cancels the others
+            if not self._chunks:
+                break
+            exporter.do()
+
+    def _chunk_progress_cb(self, exporter, progress, index):
+        self._chunks_progress[index] = progress
+        self.emit("progress",
+                  sum(self._chunks_progress) / len(self._chunks_progress))
+
+    def _chunk_finished_cb(self, exporter):
+        if exporter not in self._chunks:
+            return
+        if any(chunk.is_running for chunk in self._chunks):
+            return
+        parts = [output for chunk in self._chunks for output in chunk.outputs]
+        self._chunks = []
+        self._cancelled = threading.Event()
+        threading.Thread(target=self._join_chunks,
+                         args=(parts, self._cancelled),
+                         daemon=True).start()
+
+    def _chunk_error_cb(self, exporter, error):
+        if exporter not in self._chunks:
+            return
+        # Stops the other chunks and removes the outputs of all of them
+        self.cancel()
+        self.emit("error", error)
+
+    def _join_chunks(self, parts, cancelled):
+        """Join the frames of every chunk behind one header, in a thread."""
+        error = None
+        waves = [PcmWave.open(part) for part in parts]
+        try:
+            if None in waves:
+                error = _("Could not read the chunks of the export")
+            else:
+                PcmWave.join(self._regions[0].output, waves, None,
+                             cancelled.is_set)
+        except OSError as exception:
+            error = exception.strerror
+        except ValueError as exception:
+            error = str(exception)
+        finally:
+            for wave in waves:
+                if wave is not None:
+                    wave.close()
+            for part in parts:
+                try:
+                    os.remove(part)
+                except OSError:
+                    pass
+        if cancelled.is_set() or error is not None:
+            self._remove_outputs()
+        GLib.idle_add(self._wave_copied_cb, error, cancelled)
+
+    def _can_stream_copy(self):
+        """Whether the selection can be cut without decoding it."""
+        if self._info is None or len(self._regions) != 1:
+            return False
+        region = self._regions[0]
+        if region.is_fade_in or region.is_fade_out:
+            return False
+        streams = self._info.get_audio_streams()
+        if len(streams) != 1:
+            return False
+        _, container, audio = Exporter.PROFILES[region.audio_format]
+        audio = Gst.Caps.from_string(audio)
+        # Raw audio is as cheap to convert as to copy
+        if audio.get_structure(0).get_name() == "audio/x-raw":
+            return False
+        if not streams[0].get_caps().can_intersect(audio):
+            return False
+        top = self._info.get_stream_info()
+        if isinstance(top, GstPbutils.DiscovererContainerInfo):
+            caps = top.get_caps()
+            if container is None:
+                # Elementary streams may only be wrapped in tags
+                return caps.can_intersect(
+                    Gst.Caps.from_string(Exporter.TAG_CONTAINERS))
+            return caps.can_intersect(Gst.Caps.from_string(container))
+        return container is None
+
+    @staticmethod
+    def _get_profile(audio_format):
+        _, container, audio = Exporter.PROFILES[audio_format]
+        audio_profile = GstPbutils.EncodingAudioProfile.new(
+            Gst.Caps.from_string(audio), None, None, 0)
+        if container is None:
+            return audio_profile
+        profile = GstPbutils.EncodingContainerProfile.new(
+            "export", None, Gst.Caps.from_string(container), None)
+        profile.add_profile(audio_profile)
+        return profile
+
+    def _pad_added_cb(self, decode, pad):
+        if self._sinkpad.is_linked():
+            # Only the first audio stream is exported
+            return
+        pad.link(self._sinkpad)
+        if self.start > 0 or self.end is not None:
+            pad.add_probe(Gst.PadProbeType.BLOCK | Gst.PadProbeType.BUFFER,
+                          self._seek_probe_cb)
+
+    def _seek_probe_cb(self, pad, info):
+        """Hold the first buffer until the pipeline seeked to the range."""
+        if self._seek_requested:
+            return Gst.PadProbeReturn.REMOVE
+        self._seek_requested = True
+        # Nothing reached the encoder yet, so it never sees the flush
+        GLib.idle_add(self._seek, pad)
+        return Gst.PadProbeReturn.OK
+
+    def _seek(self, pad):
+        if self._pipeline is None:
+            return False
+        stop_type = Gst.SeekType.NONE if self.end is None else \
+            Gst.SeekType.SET
+        flags = Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE
+        event = Gst.Event.new_seek(1.0, Gst.Format.TIME, flags,
+                                   Gst.SeekType.SET, self.start,
+                                   stop_type, self.end or 0)
+        # Muxers don't forward seeks, send it straight to the decoder
+        if not pad.send_event(event):
+            self._fail(_("Could not seek to the start of the selection"))
+        return False
+
+    def _position_probe_cb(self, pad, info):
+        if info.type & Gst.PadProbeType.BUFFER:
+            buffer = info.get_buffer()
+            if self._segment is not None and \
+                    buffer.pts != Gst.CLOCK_TIME_NONE:
+                self._position = self._segment.to_stream_time(
+                    Gst.Format.TIME, buffer.pts)
+        else:
+            event = info.get_event()
+            if event.type == Gst.EventType.SEGMENT:
+                self._segment = event.parse_segment()
+        return Gst.PadProbeReturn.OK
+
+    def _progress_cb(self):
+        end = self.end
+        if end is None:
+            success, end = self._pipeline.query_duration(Gst.Format.TIME)
+            if not success:
+                return True
+        if end > self.start:
+            progress = (self._position - self.start) / (end - self.start)
+            self.emit("progress", min(max(progress, 0.0), 1.0))
+        return True
+
+    def _eos_cb(self, *args):
+        Logger.debug("[Exporter] Export of {} done".format(self._audio_path))
+        self._teardown()
+        self.emit("progress", 1.0)
+        self.emit("finished")
+
+    def _error_cb(self, bus, message):
+        error = message.parse_error()[0].message
+        Logger.error("[Exporter] Stream Error: {}".format(error))
+        self._fail(error)
+
+    def _fail(self, error):
+        self._teardown()
+        self._remove_outputs()
+        self.emit("error", error)
+
+    def _teardown(self):
+        if self._progress_id:
+            GLib.source_remove(self._progress_id)
+            self._progress_id = 0
+        if self._pipeline is not None:
+            self._pipeline.get_bus().remove_signal_watch()
+            self._pipeline.set_state(Gst.State.NULL)
+            self._pipeline = None
+            self._sinkpad = None
+
+    def _remove_outputs(self):
+        for region in self._regions:
+            try:
+                os.remove(region.output)
+            except OSError:
+                pass
@@ -0,0 +1,176 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import heapq
+import itertools
+import os
+
+from gi.repository import GObject
+
+from .exporter import Exporter
+from .log import Logger
+from .settings import Settings
+
+
+class ExportJob(GObject.GObject):
+    """An export waiting in, or run by, the ExportQueue."""
+    __gsignals__ = {
+        'progress': (GObject.SignalFlags.RUN_FIRST, None, (float, )),
+        'finished': (GObject.SignalFlags.RUN_FIRST, None, ()),
+        'error': (GObject.SignalFlags.RUN_FIRST, None, (str, )),
+        'cancelled': (GObject.SignalFlags.RUN_FIRST, None, ())
+    }
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, priority=0, **kwargs):
+        """Jobs with a higher priority start first, kwargs go to Exporter."""
+        GObject.GObject.__init__(self)
+        self.priority = priority
+        self.state = ExportJob.PENDING
+        self.progress = 0.0
+        # Pipelines the job runs on, more than one for a chunked export
+        self.slots = 1
+        # Nothing runs before the job starts
+        self._exporter = Exporter(**kwargs)
+        self._exporter.connect("progress", self._progress_cb)
+        self._exporter.connect("finished", self._finished_cb)
+        self._exporter.connect("error", self._error_cb)
+        self.outputs = self._exporter.outputs
+
+    def start(self, slots=1):
+        """Run the export, on at most slots pipelines."""
+        exporter = self._exporter
+        exporter.max_chunks = slots
+        self.state = ExportJob.RUNNING
+        exporter.do()
+        self.slots = exporter.n_pipelines
+
+    def cancel(self):
+        if self.state not in (ExportJob.PENDING, ExportJob.RUNNING):
+            return
+        if self._exporter is not None:
+            self._exporter.cancel()
+            self._exporter = None
+        self.state = ExportJob.CANCELLED
+        self.emit("cancelled")
+
+    def _progress_cb(self, exporter, progress):
+        self.progress = progress
+        self.emit("progress", progress)
+
+    def _finished_cb(self, *args):
+        self._exporter = None
+        self.state = ExportJob.FINISHED
+        self.emit("finished")
+
+    def _error_cb(self, exporter, error):
+        self._exporter = None
+        self.state = ExportJob.FAILED
+        self.emit("error", error)
+
+
+class ExportQueue(GObject.GObject):
+    """
+        Run the export jobs by priority, a few at the same time.
+        An export spends its time in its own GStreamer streaming threads,
+        so running one pipeline per CPU core keeps them all busy, a long
+        export split in chunks takes the free slots of several jobs.
+    """
+    __gsignals__ = {
+        'done': (GObject.SignalFlags.RUN_FIRST, None, ())
+    }
+    # Default instance of ExportQueue
+    instance = None
+
+    def __init__(self):
+        GObject.GObject.__init__(self)
+        # (-priority, order of arrival, job)
+        self._pending = []
+        self._running = set()
+        self._counter = itertools.count()
+
+    @staticmethod
+    def get_default():
+        """Return the default instance of ExportQueue."""
+        if ExportQueue.instance is None:
+            ExportQueue.instance = ExportQueue()
+        return ExportQueue.instance
+
+    @property
+    def max_jobs(self):
+        jobs = Settings.get_default().export_jobs
+        if jobs <= 0:
+            jobs = os.cpu_count() or 1
+        return jobs
+
+    @property
+    def free_slots(self):
+        return self.max_jobs - sum(job.slots for job in self._running)
+
+    @property
+    def jobs(self):
+        """The running jobs, then the pending ones in their start order."""
+        pending = [job for _, _, job in sorted(self._pending)
+                   if job.state == ExportJob.PENDING]
+        return list(self._running) + pending
+
+    def add(self, job):
+        """Queue a job, it starts as soon as a slot is free."""
+        heapq.heappush(self._pending, (-job.priority, next(self._counter),
+                                       job))
+        for signal in ("finished", "error", "cancelled"):
+            job.connect(signal, self._job_over_cb)
+        self._start_jobs()
+        return job
+
+    def cancel_all(self):
+        # Drop the pending jobs first, the slots freed by the running
+        # ones would start them
+        pending = [job for _, _, job in self._pending]
+        self._pending = []
+        for job in pending:
+            job.cancel()
+        for job in list(self._running):
+            job.cancel()
+
+    def _start_jobs(self):
+        while self._pending and self.free_slots > 0:
+            _, _, job = heapq.heappop(self._pending)
+            # Cancelled jobs are only dropped once they come up
+            if job.state != ExportJob.PENDING:
+                continue
+            slots = self.free_slots
+            self._running.add(job)
+            Logger.debug("[ExportQueue] Starting job on up to {} slots, "
+                         "{} running, {} pending".format(
+                             slots, len(self._running), len(self._pending)))
+            job.start(slots)
+
+    def _job_over_cb(self, job, *args):
+        job.disconnect_by_func(self._job_over_cb)
+        if job not in self._running:
+            # A pending job cancelled
+            return
+        self._running.discard(job)
+        self._start_jobs()
+        if not self._running and not self._pending:
+            self.emit("done")
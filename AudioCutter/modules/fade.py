@@ -0,0 +1,119 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import numpy
+
+
+class Fade:
+    """
+        Fade in and out curves over a range of frames.
+        The audio is faded block by block, only the frames inside the fade
+        windows are converted and scaled with NumPy, the others are passed
+        through as is.
+    """
+    LINEAR = "linear"
+    LOG = "log"
+    EQUAL_POWER = "equal-power"
+    CURVES = (LINEAR, LOG, EQUAL_POWER)
+    # Attenuation the log curve starts from, in dB
+    LOG_FLOOR = -60.0
+
+    def __init__(self, length, fade_in=0, fade_out=0, curve=LINEAR):
+        """
+            length is the number of frames of the range, None if unknown,
+            in which case it's never faded out.
+        """
+        if curve not in Fade.CURVES:
+            raise ValueError("Unknown fade curve {}".format(curve))
+        if length is not None:
+            fade_in = min(fade_in, length // 2)
+            fade_out = min(fade_out, length // 2)
+        else:
+            fade_out = 0
+        self.length = length
+        self.fade_in = fade_in
+        self.fade_out = fade_out
+        self.curve = curve
+
+    def is_faded(self, first, count):
+        """Whether the frames [first, first + count) need to be faded."""
+        if first < self.fade_in:
+            return count > 0
+        return self.fade_out > 0 and \
+            first + count > self.length - self.fade_out
+
+    def get_gains(self, first, count):
+        """Return the gains of the frames [first, first + count)."""
+        frames = numpy.arange(first, first + count, dtype=numpy.float64)
+        ramp = numpy.ones(count)
+        if self.fade_in:
+            numpy.minimum(ramp, frames / self.fade_in, out=ramp)
+        if self.fade_out:
+            numpy.minimum(ramp, (self.length - 1 - frames) / self.fade_out,
+                          out=ramp)
+        numpy.clip(ramp, 0.0, 1.0, out=ramp)
+        return Fade.get_curve(self.curve, ramp)
+
+    @staticmethod
+    def get_curve(curve, ramp):
+        """Map a linear ramp in [0, 1] to the gains of a curve."""
+        if curve == Fade.EQUAL_POWER:
+            return numpy.sin(ramp * (numpy.pi / 2))
+        if curve == Fade.LOG:
+            # Linear in dB, from LOG_FLOOR up to 0 dB, silent at 0
+            gains = numpy.power(10.0, Fade.LOG_FLOOR * (1.0 - ramp) / 20)
+            gains[ramp <= 0] = 0.0
+            return gains
+        return ramp
+
+    def apply(self, samples, first):
+        """
+            Fade the (frames, channels) samples starting at frame first.
+            Return samples itself when none of them is faded, a faded copy
+            otherwise.
+        """
+        count = len(samples)
+        if not self.is_faded(first, count):
+            return samples
+        samples = samples.copy()
+        # The frames of the block inside each window, relative to it
+        ranges = [(0, min(count, self.fade_in - first))]
+        if self.fade_out:
+            ranges.append((max(0, self.length - self.fade_out - first),
+                           count))
+        for start, stop in ranges:
+            if start < stop:
+                samples[start:stop] = Fade.scale(
+                    samples[start:stop],
+                    self.get_gains(first + start, stop - start))
+        return samples
+
+    @staticmethod
+    def scale(samples, gains):
+        """Return the (frames, channels) samples scaled by per frame gains."""
+        dtype = samples.dtype
+        scaled = samples.astype(numpy.float64)
+        if dtype.kind == "u":
+            # Unsigned samples are centered on half their range
+            middle = numpy.iinfo(dtype).max // 2 + 1
+            scaled = (scaled - middle) * gains[:, None] + middle
+        else:
+            scaled *= gains[:, None]
+        if dtype.kind != "f":
+            info = numpy.iinfo(dtype)
+            scaled = numpy.clip(numpy.rint(scaled), info.min, info.max)
+        return scaled.astype(dtype)
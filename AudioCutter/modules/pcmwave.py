@@ -0,0 +1,284 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import mmap
+import os
+import struct
+
+import numpy
+
+from .fade import Fade
+
+
+class PcmWave:
+    """
+        The format and data location of a PCM WAV file.
+        A cut of such a file is a byte range behind a new header, so it's
+        copied as is, only the frames being faded go through NumPy.
+    """
+    WAVE_FORMAT_PCM = 1
+    WAVE_FORMAT_IEEE_FLOAT = 3
+    WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+    CHUNK = struct.Struct("<4sI")
+    # format tag, channels, rate, byte rate, block align, bits per sample
+    FMT = struct.Struct("<HHIIHH")
+    # RIFF size, data size, sample count, table length
+    DS64 = struct.Struct("<QQQI")
+    # Bytes copied at once, and between two progress reports
+    COPY_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, source, buffer, format_tag, channels, rate, bits,
+                 data_offset, data_size):
+        self._source = source
+        self._buffer = buffer
+        self.format_tag = format_tag
+        self.channels = channels
+        self.rate = rate
+        self.bits = bits
+        self.data_offset = data_offset
+        self.data_size = data_size
+
+    @staticmethod
+    def open(filename):
+        """Map a WAV file, return None unless it holds PCM or float data."""
+        try:
+            source = open(filename, "rb")
+        except OSError:
+            return None
+        try:
+            buffer = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            source.close()
+            return None
+        wave = PcmWave._parse(source, buffer)
+        if wave is None:
+            buffer.close()
+            source.close()
+        return wave
+
+    @staticmethod
+    def _parse(source, buffer):
+        if len(buffer) < 12 or buffer[8:12] != b"WAVE":
+            return None
+        if buffer[:4] not in (b"RIFF", b"RF64", b"BW64"):
+            return None
+        fmt = None
+        ds64_data_size = None
+        position = 12
+        while position + PcmWave.CHUNK.size <= len(buffer):
+            chunk_id, size = PcmWave.CHUNK.unpack_from(buffer, position)
+            position += PcmWave.CHUNK.size
+            if chunk_id == b"ds64" and size >= PcmWave.DS64.size:
+                ds64_data_size = PcmWave.DS64.unpack_from(buffer,
+                                                          position)[1]
+            elif chunk_id == b"fmt " and size >= PcmWave.FMT.size:
+                fmt = list(PcmWave.FMT.unpack_from(buffer, position))
+                if fmt[0] == PcmWave.WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                    # The actual format starts the sub format GUID
+                    fmt[0] = struct.unpack_from("<H", buffer,
+                                                position + 24)[0]
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                if size == 0xFFFFFFFF and ds64_data_size is not None:
+                    size = ds64_data_size
+                # Truncated recordings still have their frames
+                size = min(size, len(buffer) - position)
+                format_tag, channels, rate, _, _, bits = fmt
+                if format_tag not in (PcmWave.WAVE_FORMAT_PCM,
+                                      PcmWave.WAVE_FORMAT_IEEE_FLOAT):
+                    return None
+                if channels == 0 or rate == 0 or bits % 8:
+                    return None
+                return PcmWave(source, buffer, format_tag, channels, rate,
+                               bits, position, size)
+            # Chunks are word aligned
+            position += size + (size & 1)
+        return None
+
+    def close(self):
+        self._buffer.close()
+        self._source.close()
+
+    @property
+    def block_align(self):
+        """Size in bytes of a frame."""
+        return self.channels * self.bits // 8
+
+    @property
+    def n_frames(self):
+        return self.data_size // self.block_align
+
+    @property
+    def dtype(self):
+        """NumPy type of the samples, None if they can't be faded."""
+        if self.format_tag == PcmWave.WAVE_FORMAT_IEEE_FLOAT:
+            return {32: "<f4", 64: "<f8"}.get(self.bits)
+        return {8: "u1", 16: "<i2", 32: "<i4"}.get(self.bits)
+
+    def get_frame(self, position):
+        """Index of the frame at a position in ns, within the file."""
+        frame = int(round(position * self.rate / 1000000000))
+        return min(max(frame, 0), self.n_frames)
+
+    def cut(self, output, first, last, fade_in=0, fade_out=0,
+            progress=None, cancelled=None, curve=Fade.LINEAR):
+        """
+            Write the frames [first, last) to output as a new WAV file,
+            fading in and out over the given number of frames.
+            progress is called with the written fraction, and the copy
+            stops, returning False, as soon as cancelled() is true.
+        """
+        if (fade_in or fade_out) and self.dtype is None:
+            raise ValueError("Can't fade {} bits samples".format(self.bits))
+        fade = Fade(last - first, fade_in, fade_out, curve)
+        fade_in, fade_out = fade.fade_in, fade.fade_out
+        size = (last - first) * self.block_align
+        # Faded frames, copied ranges, as (first frame, frames, is faded)
+        parts = [(first, fade_in, True),
+                 (first + fade_in, last - first - fade_in - fade_out, False),
+                 (last - fade_out, fade_out, True)]
+        written = 0
+        temporary = PcmWave._get_temporary(output)
+        try:
+            with open(temporary, "wb", buffering=0) as wavefile:
+                self._write_all(wavefile, self._get_header(size))
+                for frame, count, is_faded in parts:
+                    offset = self.data_offset + frame * self.block_align
+                    length = count * self.block_align
+                    if is_faded:
+                        if count:
+                            self._write_all(wavefile, self._fade(
+                                offset, length, fade, frame - first))
+                        written += length
+                        continue
+                    end = offset + length
+                    while offset < end:
+                        if cancelled is not None and cancelled():
+                            return False
+                        copied = self._copy(
+                            wavefile, offset,
+                            min(PcmWave.COPY_SIZE, end - offset))
+                        offset += copied
+                        written += copied
+                        if progress is not None:
+                            progress(written / max(size, 1))
+                if size & 1:
+                    self._write_all(wavefile, b"\0")
+            os.replace(temporary, output)
+        finally:
+            PcmWave._remove(temporary)
+        return True
+
+    @staticmethod
+    def join(output, waves, progress=None, cancelled=None):
+        """
+            Write the frames of waves, all of the same format, back to back
+            to output as one WAV file.
+            progress and cancelled are called as by cut().
+        """
+        formats = set((wave.format_tag, wave.channels, wave.rate, wave.bits)
+                      for wave in waves)
+        if len(formats) != 1:
+            raise ValueError("Can't join WAV files of different formats")
+        size = sum(wave.data_size for wave in waves)
+        written = 0
+        temporary = PcmWave._get_temporary(output)
+        try:
+            with open(temporary, "wb", buffering=0) as wavefile:
+                PcmWave._write_all(wavefile, waves[0]._get_header(size))
+                for wave in waves:
+                    offset = wave.data_offset
+                    end = offset + wave.data_size
+                    while offset < end:
+                        if cancelled is not None and cancelled():
+                            return False
+                        copied = wave._copy(
+                            wavefile, offset,
+                            min(PcmWave.COPY_SIZE, end - offset))
+                        offset += copied
+                        written += copied
+                        if progress is not None:
+                            progress(written / max(size, 1))
+                if size & 1:
+                    PcmWave._write_all(wavefile, b"\0")
+            os.replace(temporary, output)
+        finally:
+            PcmWave._remove(temporary)
+        return True
+
+    @staticmethod
+    def _get_temporary(output):
+        """
+            Return the file written before it replaces output, the source
+            of a cut may be its output and must stay whole until then.
+        """
+        directory, name = os.path.split(output)
+        return os.path.join(directory, ".{}.tmp".format(name))
+
+    @staticmethod
+    def _remove(filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def _get_header(self, size):
+        fmt = PcmWave.FMT.pack(self.format_tag, self.channels, self.rate,
+                               self.rate * self.block_align,
+                               self.block_align, self.bits)
+        chunks = PcmWave.CHUNK.pack(b"fmt ", len(fmt)) + fmt
+        riff_size = 4 + len(chunks) + PcmWave.CHUNK.size + size + (size & 1)
+        if riff_size <= 0xFFFFFFFF:
+            return b"".join([PcmWave.CHUNK.pack(b"RIFF", riff_size), b"WAVE",
+                             chunks, PcmWave.CHUNK.pack(b"data", size)])
+        # Too large for RIFF sizes, go for RF64
+        ds64 = PcmWave.DS64.pack(
+            riff_size + PcmWave.CHUNK.size + PcmWave.DS64.size, size,
+            size // self.block_align, 0)
+        return b"".join([PcmWave.CHUNK.pack(b"RF64", 0xFFFFFFFF), b"WAVE",
+                         PcmWave.CHUNK.pack(b"ds64", len(ds64)), ds64,
+                         chunks, PcmWave.CHUNK.pack(b"data", 0xFFFFFFFF)])
+
+    def _fade(self, offset, length, fade, first):
+        """Return the faded bytes of a range of frames."""
+        dtype = numpy.dtype(self.dtype)
+        samples = numpy.frombuffer(self._buffer, dtype=dtype,
+                                   count=length // dtype.itemsize,
+                                   offset=offset)
+        return fade.apply(samples.reshape(-1, self.channels),
+                          first).tobytes()
+
+    def _copy(self, wavefile, offset, length):
+        """Append a range of the source to wavefile, return its size."""
+        try:
+            copied = os.copy_file_range(self._source.fileno(),
+                                        wavefile.fileno(), length, offset)
+            if copied > 0:
+                return copied
+        except (AttributeError, OSError):
+            # Not available here or across these file systems
+            pass
+        with memoryview(self._buffer) as buffer:
+            self._write_all(wavefile, buffer[offset:offset + length])
+        return length
+
+    @staticmethod
+    def _write_all(wavefile, data):
+        data = memoryview(data)
+        while data:
+            data = data[wavefile.write(data):]
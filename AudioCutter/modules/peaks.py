@@ -0,0 +1,83 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import numpy
+
+
+class PeakLevel:
+    """A single resolution of the waveform peaks."""
+
+    def __init__(self, factor, mean):
+        # Number of original samples merged in one sample of this level
+        self.factor = factor
+        self.mean = mean
+
+    def __len__(self):
+        return len(self.mean)
+
+
+class PeakPyramid:
+    """
+        Mipmap like pyramid of the waveform peaks.
+        Each level merges DECIMATION samples of the previous one into
+        their mean, the value the waveform is drawn from, so drawing a
+        zoomed out waveform doesn't have to walk over every single sample.
+    """
+    DECIMATION = 4
+    # Don't go further down once a level is that small
+    MIN_LENGTH = 256
+    # Samples read at once when building the levels, lazily decoded
+    # sources never have to be inflated as a whole
+    CHUNK_SIZE = 1 << 18
+
+    def __init__(self, samples):
+        if isinstance(samples, numpy.ndarray) or not hasattr(samples, "shape"):
+            samples = numpy.asarray(samples, dtype=numpy.float32)
+        self.levels = [PeakLevel(1, samples)]
+        length = len(samples)
+        factor = 1
+        while length > PeakPyramid.MIN_LENGTH:
+            length = -(-length // PeakPyramid.DECIMATION)
+            factor *= PeakPyramid.DECIMATION
+            self.levels.append(PeakLevel(factor,
+                                         numpy.zeros(length, numpy.float32)))
+        for start in range(0, len(samples), PeakPyramid.CHUNK_SIZE):
+            self.update(start, min(start + PeakPyramid.CHUNK_SIZE,
+                                   len(samples)))
+
+    def update(self, start, end):
+        """Recompute the coarser levels after samples[start:end] changed."""
+        for prev, level in zip(self.levels, self.levels[1:]):
+            start //= PeakPyramid.DECIMATION
+            end = -(-end // PeakPyramid.DECIMATION)
+            if start >= end:
+                break
+            first = start * PeakPyramid.DECIMATION
+            last = min(end * PeakPyramid.DECIMATION, len(prev))
+            indices = numpy.arange(0, last - first, PeakPyramid.DECIMATION)
+            counts = numpy.diff(numpy.append(indices, last - first))
+            level.mean[start:end] = numpy.add.reduceat(
+                prev.mean[first:last], indices) / counts
+
+    def get_level(self, samples_per_pixel):
+        """Return the coarsest level with at least a sample per pixel."""
+        best = self.levels[0]
+        for level in self.levels[1:]:
+            if level.factor > samples_per_pixel:
+                break
+            best = level
+        return best
@@ -16,7 +16,7 @@ You should have received a copy of the GNU General Public License
 along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
 """
 from gi.repository import Gio, GLib
-from . import Logger
+from .log import Logger
 
 
 class Settings(Gio.Settings):
@@ -84,3 +84,100 @@ class Settings(Gio.Settings):
         self.set_string('last-file', last_file)
         Logger.debug("[Settings] Last opened file is set to: "
                      "{}".format(last_file))
+
+    @property
+    def waveform_analysis_threads(self):
+        """Return the max threads a decoder can use for the waveform."""
+        return self.get_int('waveform-analysis-threads')
+
+    @waveform_analysis_threads.setter
+    def waveform_analysis_threads(self, threads):
+        self.set_int('waveform-analysis-threads', threads)
+        Logger.debug("[Settings] Waveform analysis threads is set to: "
+                     "{}".format(threads))
+
+    @property
+    def waveform_analysis_niceness(self):
+        """Return the niceness of the waveform analysis threads."""
+        return self.get_int('waveform-analysis-niceness')
+
+    @waveform_analysis_niceness.setter
+    def waveform_analysis_niceness(self, niceness):
+        self.set_int('waveform-analysis-niceness', niceness)
+        Logger.debug("[Settings] Waveform analysis niceness is set to: "
+                     "{}".format(niceness))
+
+    @property
+    def waveform_analysis_pipelines(self):
+        """Return the number of pipelines generating a waveform."""
+        return self.get_int('waveform-analysis-pipelines')
+
+    @waveform_analysis_pipelines.setter
+    def waveform_analysis_pipelines(self, pipelines):
+        self.set_int('waveform-analysis-pipelines', pipelines)
+        Logger.debug("[Settings] Waveform analysis pipelines is set to: "
+                     "{}".format(pipelines))
+
+    @property
+    def waveform_cache_size(self):
+        """Return the maximum size of the waveforms cache, in MiB."""
+        return self.get_int('waveform-cache-size')
+
+    @waveform_cache_size.setter
+    def waveform_cache_size(self, size):
+        self.set_int('waveform-cache-size', size)
+        Logger.debug("[Settings] Waveform cache size is set to: "
+                     "{} MiB".format(size))
+
+    @property
+    def waveform_cache_full_hash(self):
+        """Return whether the whole media is hashed to find its waveform."""
+        return self.get_boolean('waveform-cache-full-hash')
+
+    @waveform_cache_full_hash.setter
+    def waveform_cache_full_hash(self, status):
+        self.set_boolean('waveform-cache-full-hash', status)
+        Logger.debug("[Settings] Waveform cache full hash is set to: "
+                     "{}".format(str(status)))
+
+    @property
+    def waveform_cache_encoding(self):
+        """Return how the cached waveforms are stored on disk."""
+        return self.get_string('waveform-cache-encoding')
+
+    @waveform_cache_encoding.setter
+    def waveform_cache_encoding(self, encoding):
+        self.set_string('waveform-cache-encoding', encoding)
+        Logger.debug("[Settings] Waveform cache encoding is set to: "
+                     "{}".format(encoding))
+
+    @property
+    def export_jobs(self):
+        """Return the number of export pipelines run at the same time."""
+        return self.get_int('export-jobs')
+
+    @export_jobs.setter
+    def export_jobs(self, jobs):
+        self.set_int('export-jobs', jobs)
+        Logger.debug("[Settings] Export jobs is set to: {}".format(jobs))
+
+    @property
+    def split_long_exports(self):
+        """Return whether long WAV exports are decoded in parallel chunks."""
+        return self.get_boolean('split-long-exports')
+
+    @split_long_exports.setter
+    def split_long_exports(self, status):
+        self.set_boolean('split-long-exports', status)
+        Logger.debug("[Settings] Split long exports is set to: "
+                     "{}".format(str(status)))
+
+    @property
+    def fade_curve(self):
+        """Return the curve of the exported fades."""
+        return self.get_string('fade-curve')
+
+    @fade_curve.setter
+    def fade_curve(self, curve):
+        self.set_string('fade-curve', curve)
+        Logger.debug("[Settings] Fade curve is set to: {}".format(curve))
@@ -0,0 +1,270 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import mmap
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from tempfile import NamedTemporaryFile
+
+import numpy
+
+
+class CompactSamples:
+    """
+        Read only view over log quantized, block compressed samples.
+        Blocks are only inflated when a slice touching them is requested,
+        and the few latest ones are kept around as float32.
+    """
+    CACHED_BLOCKS = 8
+
+    def __init__(self, buffer, blocks, block_samples, length, bits):
+        self._buffer = buffer
+        self._blocks = blocks
+        self._block_samples = block_samples
+        self._length = length
+        self._dtype = "<u1" if bits == 8 else "<u2"
+        self._levels = (1 << bits) - 1
+        self._cache = OrderedDict()
+
+    @property
+    def dtype(self):
+        return numpy.dtype(numpy.float32)
+
+    @property
+    def shape(self):
+        return (self._length,)
+
+    @property
+    def ndim(self):
+        return 1
+
+    def __len__(self):
+        return self._length
+
+    def __array__(self, dtype=None, copy=None):
+        samples = self[:]
+        return samples if dtype is None else samples.astype(dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            index = range(self._length)[key]
+            return self[index:index + 1][0]
+        start, stop, step = key.indices(self._length)
+        if step != 1:
+            indices = numpy.arange(start, stop, step)
+            if not len(indices):
+                return numpy.empty(0, dtype=numpy.float32)
+            first = indices.min()
+            return self[first:indices.max() + 1][indices - first]
+        samples = numpy.empty(max(stop - start, 0), dtype=numpy.float32)
+        position = start
+        while position < stop:
+            index, offset = divmod(position, self._block_samples)
+            block = self._get_block(index)
+            count = min(len(block) - offset, stop - position)
+            samples[position - start:position - start + count] = \
+                block[offset:offset + count]
+            position += count
+        return samples
+
+    def _get_block(self, index):
+        block = self._cache.pop(index, None)
+        if block is None:
+            offset, size = self._blocks[index]
+            data = zlib.decompress(self._buffer[offset:offset + size])
+            block = WaveFile.dequantize(
+                numpy.frombuffer(data, dtype=self._dtype), self._levels)
+        self._cache[index] = block
+        if len(self._cache) > CompactSamples.CACHED_BLOCKS:
+            self._cache.popitem(last=False)
+        return block
+
+
+class WaveFile:
+    """
+        Versioned container of the cached waveform peaks.
+        A small header records how and from what the peaks were computed,
+        the peaks themselves are memory-mapped on open.
+    """
+    MAGIC = b"ACWAVE\0\0"
+    VERSION = 1
+    # magic, version, encoding, channels, sample duration, number of
+    # samples, source size, source modification time, data offset
+    HEADER = struct.Struct("<8sHHHxxQQQqQ")
+    # Keep the samples aligned whatever the header size is
+    DATA_OFFSET = 64
+
+    ENCODING_FLOAT32 = 0
+    ENCODING_UINT16_LOG = 1
+    ENCODING_UINT8_LOG = 2
+    # Names used by the settings
+    ENCODINGS = {
+        "float32": ENCODING_FLOAT32,
+        "uint16-log": ENCODING_UINT16_LOG,
+        "uint8-log": ENCODING_UINT8_LOG
+    }
+    BITS = {ENCODING_UINT16_LOG: 16, ENCODING_UINT8_LOG: 8}
+
+    # Compact encodings: samples per block, number of blocks, followed
+    # by the offset and size of each compressed block
+    BLOCK_HEADER = struct.Struct("<II")
+    BLOCK_ENTRY = struct.Struct("<QI")
+    BLOCK_SAMPLES = 65536
+    # Peaks are RMS values in percents, quantized on a log scale so
+    # the quiet parts keep their details
+    MAX_PEAK = 100.0
+    LOG_SCALE = 10.0
+
+    def __init__(self, buffer, header):
+        (_, self.version, self.encoding, self.channels,
+         self.sample_duration, self.n_samples,
+         self.source_size, self.source_mtime,
+         self.data_offset) = header
+        self._buffer = buffer
+        self._blocks = None
+        self._block_samples = 0
+
+    @staticmethod
+    def open(filename):
+        """Open a cached waveform, return None if it's missing or invalid."""
+        try:
+            with open(filename, "rb") as wavefile:
+                buffer = mmap.mmap(wavefile.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # ValueError is raised when mapping an empty file
+            return None
+        if len(buffer) < WaveFile.DATA_OFFSET:
+            return None
+        header = WaveFile.HEADER.unpack_from(buffer)
+        if header[0] != WaveFile.MAGIC or header[1] != WaveFile.VERSION:
+            return None
+        wavefile = WaveFile(buffer, header)
+        if wavefile.encoding == WaveFile.ENCODING_FLOAT32:
+            size = wavefile.channels * wavefile.n_samples * 4
+            if len(buffer) < wavefile.data_offset + size:
+                return None
+        elif wavefile.encoding in WaveFile.BITS:
+            if wavefile.channels != 1 or not wavefile._read_blocks():
+                return None
+        else:
+            return None
+        return wavefile
+
+    @staticmethod
+    def save(filename, samples, sample_duration, source_size, source_mtime,
+             encoding=ENCODING_FLOAT32):
+        """
+            Write samples, a (channels, n_samples) or mono array, to disk.
+            The compact encodings only apply to mono samples, others
+            are always stored as float32.
+        """
+        samples = numpy.ascontiguousarray(samples, dtype="<f4")
+        channels = 1 if samples.ndim == 1 else samples.shape[0]
+        if channels != 1:
+            encoding = WaveFile.ENCODING_FLOAT32
+        header = WaveFile.HEADER.pack(WaveFile.MAGIC, WaveFile.VERSION,
+                                      encoding, channels,
+                                      int(sample_duration),
+                                      samples.shape[-1],
+                                      source_size, source_mtime,
+                                      WaveFile.DATA_OFFSET)
+        # Write to a temporary file first so readers never see half of it
+        directory = os.path.dirname(filename)
+        with NamedTemporaryFile(dir=directory, delete=False) as wavefile:
+            wavefile.write(header.ljust(WaveFile.DATA_OFFSET, b"\0"))
+            if encoding == WaveFile.ENCODING_FLOAT32:
+                wavefile.write(samples.tobytes())
+            else:
+                WaveFile._write_blocks(wavefile, samples,
+                                       WaveFile.BITS[encoding])
+        os.replace(wavefile.name, filename)
+
+    @staticmethod
+    def quantize(samples, levels):
+        """Map the peaks to integers in [0, levels] on a log scale."""
+        norm = numpy.log1p(WaveFile.LOG_SCALE * WaveFile.MAX_PEAK)
+        samples = numpy.clip(samples, 0, WaveFile.MAX_PEAK)
+        samples = numpy.log1p(samples * WaveFile.LOG_SCALE) / norm
+        return numpy.rint(samples * levels)
+
+    @staticmethod
+    def dequantize(samples, levels):
+        """Inverse of quantize, as float32."""
+        norm = numpy.log1p(WaveFile.LOG_SCALE * WaveFile.MAX_PEAK)
+        samples = numpy.expm1(samples * (norm / levels))
+        return (samples / WaveFile.LOG_SCALE).astype(numpy.float32)
+
+    @staticmethod
+    def _write_blocks(wavefile, samples, bits):
+        levels = (1 << bits) - 1
+        dtype = "<u1" if bits == 8 else "<u2"
+        quantized = WaveFile.quantize(samples, levels).astype(dtype)
+        blocks = [zlib.compress(quantized[i:i + WaveFile.BLOCK_SAMPLES])
+                  for i in range(0, len(quantized), WaveFile.BLOCK_SAMPLES)]
+        table_size = len(blocks) * WaveFile.BLOCK_ENTRY.size
+        offset = WaveFile.DATA_OFFSET + WaveFile.BLOCK_HEADER.size + table_size
+        wavefile.write(WaveFile.BLOCK_HEADER.pack(WaveFile.BLOCK_SAMPLES,
+                                                  len(blocks)))
+        for block in blocks:
+            wavefile.write(WaveFile.BLOCK_ENTRY.pack(offset, len(block)))
+            offset += len(block)
+        for block in blocks:
+            wavefile.write(block)
+
+    def _read_blocks(self):
+        """Load the blocks table, return False if it's truncated."""
+        end = self.data_offset + WaveFile.BLOCK_HEADER.size
+        if len(self._buffer) < end:
+            return False
+        block_samples, count = WaveFile.BLOCK_HEADER.unpack_from(
+            self._buffer, self.data_offset)
+        if block_samples == 0 or count * block_samples < self.n_samples:
+            return False
+        if len(self._buffer) < end + count * WaveFile.BLOCK_ENTRY.size:
+            return False
+        blocks = list(WaveFile.BLOCK_ENTRY.iter_unpack(
+            self._buffer[end:end + count * WaveFile.BLOCK_ENTRY.size]))
+        if any(offset + size > len(self._buffer) for offset, size in blocks):
+            return False
+        self._blocks = blocks
+        self._block_samples = block_samples
+        return True
+
+    def is_up_to_date(self, sample_duration, source_size):
+        """Whether the peaks were computed the same way from that source."""
+        expected = (int(sample_duration), source_size)
+        return (self.sample_duration, self.source_size) == expected
+
+    @property
+    def samples(self):
+        """
+            The memory-mapped samples, mono files give a 1D array.
+            Compact files give a lazily decoded CompactSamples instead.
+        """
+        if self.encoding in WaveFile.BITS:
+            return CompactSamples(self._buffer, self._blocks,
+                                  self._block_samples, self.n_samples,
+                                  WaveFile.BITS[self.encoding])
+        samples = numpy.frombuffer(self._buffer, dtype="<f4",
+                                   count=self.channels * self.n_samples,
+                                   offset=self.data_offset)
+        if self.channels > 1:
+            samples = samples.reshape(self.channels, self.n_samples)
+        return samples
@@ -0,0 +1,426 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import threading
+
+import numpy
+from gi import require_version
+require_version('Gst', '1.0')
+from gi.repository import GLib, GObject, Gst
+
+from .log import Logger
+from .settings import Settings
+from .cache import WaveformCache
+from ..utils import get_uri_stat
+
+SAMPLE_DURATION = Gst.SECOND / 100
+# Audio handed to the previewers at once, in s
+PREVIEW_BUFFER_DURATION = 1
+# Don't split the analysis in ranges shorter than that
+MIN_SEGMENT_DURATION = 60 * Gst.SECOND
+
+
+def open_wavefile_for_uri(uri):
+    """Return the cached waveform of uri, None if missing or outdated."""
+    return WaveformCache.get_default().open(uri, SAMPLE_DURATION)
+
+
+def lookup_wavefile_for_uri(uri, callback):
+    """
+        Look the cached waveform of uri up in a thread, as fingerprinting
+        the media reads it. callback(wavefile, source) is then called from
+        the main loop, source being what WaveformGenerator caches it under.
+    """
+    def lookup():
+        wavefile, source = WaveformCache.get_default().lookup(
+            uri, SAMPLE_DURATION)
+        GLib.idle_add(callback, wavefile, source)
+
+    threading.Thread(target=lookup, daemon=True).start()
+
+
+class AnalysisTaskPool(Gst.TaskPool):
+    """
+        Run the streaming threads of the analysis pipelines.
+        Each task gets a thread of its own, reniced when it starts and
+        ended with the task. GStreamer's default pool reuses its threads
+        for any pipeline, and they could not be given their priority back.
+    """
+    # Default instance of AnalysisTaskPool
+    instance = None
+
+    def __init__(self):
+        Gst.TaskPool.__init__(self)
+        # Thread of each pushed task, by id
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    @staticmethod
+    def get_default():
+        """Return the default instance of AnalysisTaskPool."""
+        if AnalysisTaskPool.instance is None:
+            AnalysisTaskPool.instance = AnalysisTaskPool()
+        return AnalysisTaskPool.instance
+
+    def do_prepare(self):
+        # Threads are started per task, there is nothing to set up
+        pass
+
+    def do_cleanup(self):
+        pass
+
+    def do_push(self, func, *user_data):
+        niceness = Settings.get_default().waveform_analysis_niceness
+        thread = threading.Thread(target=self._run,
+                                  args=(func, user_data, niceness),
+                                  daemon=True)
+        with self._lock:
+            task_id = self._next_id
+            self._next_id += 1
+            self._threads[task_id] = thread
+        thread.start()
+        return task_id
+
+    def do_join(self, task_id):
+        with self._lock:
+            thread = self._threads.pop(task_id, None)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    @staticmethod
+    def _run(func, user_data, niceness):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(),
+                           niceness)
+        except (AttributeError, OSError):
+            # Per-thread niceness is only available on Linux
+            pass
+        # The streaming loop runs without holding the GIL
+        func(*user_data)
+
+
+class PreviewerBin(Gst.Bin):
+    """Baseclass for elements gathering datas to create previews."""
+
+    def __init__(self, bin_desc):
+        Gst.Bin.__init__(self)
+
+        self.internal_bin = Gst.parse_bin_from_description(bin_desc, True)
+        self.add(self.internal_bin)
+        self.add_pad(Gst.GhostPad.new(None, self.internal_bin.sinkpads[0]))
+        # Previewers ending with a sink have no source pad
+        if self.internal_bin.srcpads:
+            self.add_pad(Gst.GhostPad.new(None,
+                                          self.internal_bin.srcpads[0]))
+
+    def finalize(self, proxy=None):
+        """Finalizes the previewer, saving data to the disk if needed."""
+        pass
+
+
+class WaveformPreviewer(PreviewerBin):
+    """
+        Sink bin computing the waveform peaks of a range of the samples.
+        The decoded audio is pulled as mono float buffers and the RMS of
+        each SAMPLE_DURATION window is computed with NumPy. The buffers
+        are merged into PREVIEW_BUFFER_DURATION ones first when
+        audiobuffersplit is available, so the Python callback only runs
+        once per second of audio.
+    """
+
+    __gproperties__ = {
+        "uri": (str,
+                "uri of the media file",
+                "A URI",
+                "",
+                GObject.ParamFlags.READWRITE),
+        "duration": (GObject.TYPE_UINT64,
+                     "Duration",
+                     "Duration",
+                     0, GLib.MAXUINT64 - 1, 0, GObject.ParamFlags.READWRITE)
+    }
+
+    def __init__(self):
+        description = "audioconvert ! audioresample ! " \
+            "audio/x-raw,format=F32LE,channels=1 ! "
+        if Gst.ElementFactory.find("audiobuffersplit"):
+            description += "audiobuffersplit output-buffer-duration=" \
+                "{}/1 ! ".format(PREVIEW_BUFFER_DURATION)
+        PreviewerBin.__init__(self, description + "appsink name=sink "
+                              "sync=false emit-signals=true")
+        self.sink = self.internal_bin.get_by_name("sink")
+        self.sink.connect("new-sample", self._new_sample_cb)
+        # Sum of the squared samples and number of samples per window
+        self._energy = None
+        self._counts = None
+
+        self.uri = None
+        self.samples = None
+        self.n_samples = 0
+        # Range of the samples collected by this previewer
+        self.start = 0
+        self.end = 0
+        # Index of the first sample not known yet
+        self.filled = 0
+        self.duration = 0
+
+    def do_get_property(self, prop):
+
+        if prop.name == 'uri':
+            return self.uri
+        elif prop.name == 'duration':
+            return self.duration
+        else:
+            raise AttributeError('unknown property %s' % prop.name)
+
+    def do_set_property(self, prop, value):
+        if prop.name == 'uri':
+            self.uri = value
+        elif prop.name == 'duration':
+            self.duration = value
+            self.n_samples = self.duration / SAMPLE_DURATION
+            self.set_range(numpy.zeros(int(self.n_samples),
+                                       dtype=numpy.float32),
+                           0, int(self.n_samples))
+        else:
+            raise AttributeError('unknown property %s' % prop.name)
+
+    def set_range(self, samples, start, end):
+        """Only collect samples[start:end], samples can be shared."""
+        self.samples = samples
+        self.start = start
+        self.end = end
+        self.filled = start
+        self._energy = numpy.zeros(end - start, dtype=numpy.float64)
+        self._counts = numpy.zeros(end - start, dtype=numpy.int64)
+
+    def _new_sample_cb(self, sink):
+        sample = sink.emit("pull-sample")
+        buf = sample.get_buffer()
+        rate = sample.get_caps().get_structure(0).get_value("rate")
+        stream_time = sample.get_segment().to_stream_time(Gst.Format.TIME,
+                                                          buf.pts)
+        if stream_time == Gst.CLOCK_TIME_NONE or not rate:
+            return Gst.FlowReturn.OK
+        data = numpy.frombuffer(buf.extract_dup(0, buf.get_size()),
+                                dtype=numpy.float32)
+        self.add_samples(data, stream_time, rate)
+        return Gst.FlowReturn.OK
+
+    def add_samples(self, data, stream_time, rate):
+        """Accumulate mono audio samples starting at stream_time (ns)."""
+        if not len(data):
+            return
+        # Window of each audio sample, relative to the first one
+        windows_per_second = int(Gst.SECOND // SAMPLE_DURATION)
+        offset = stream_time * rate // Gst.SECOND
+        windows = (offset + numpy.arange(len(data))) * windows_per_second
+        windows //= rate
+        first = int(windows[0])
+        windows -= first
+        energy = numpy.bincount(windows, weights=data * data)
+        counts = numpy.bincount(windows)
+
+        # Keep the windows of our range only
+        lower = first - self.start
+        upper = lower + len(counts)
+        skip = max(0, -lower)
+        lower = max(0, lower)
+        upper = min(upper, self.end - self.start)
+        if lower >= upper:
+            return
+        self._energy[lower:upper] += energy[skip:skip + upper - lower]
+        self._counts[lower:upper] += counts[skip:skip + upper - lower]
+        counts = numpy.maximum(self._counts[lower:upper], 1)
+        rms = numpy.sqrt(self._energy[lower:upper] / counts)
+        self.samples[self.start + lower:self.start + upper] = rms * 100
+        self.filled = max(self.filled, self.start + upper)
+
+
+Gst.Element.register(None, "waveformbin", Gst.Rank.NONE, WaveformPreviewer)
+
+
+class WaveformGenerator(GObject.GObject):
+    """
+        Generate the waveform of a media file and save it to the cache.
+        The file is split in time ranges, each one decoded by its own
+        seeking pipeline, all of them writing in the same samples array.
+    """
+
+    __gsignals__ = {
+        'done': (GObject.SignalFlags.RUN_FIRST, None, ()),
+        'error': (GObject.SignalFlags.RUN_FIRST, None, (str, ))
+    }
+
+    def __init__(self, uri, duration, segments=None, source=None):
+        GObject.GObject.__init__(self)
+        self.uri = uri
+        self.duration = duration
+        # Number of ranges to analyse in parallel, None to guess it
+        self.segments = segments
+        self.n_samples = int(duration / SAMPLE_DURATION)
+        self.samples = numpy.zeros(self.n_samples, dtype=numpy.float32)
+        # How fast the waveform was generated, times realtime
+        self.speed = None
+        # Stat the source before analysing it, not after. The cache key
+        # and stat of lookup_wavefile_for_uri can be passed as source.
+        if source is None:
+            source_stat = get_uri_stat(uri)
+            source = (WaveformCache.get_default().get_key(uri, *source_stat),
+                      ) + tuple(source_stat)
+        self._cache_key = source[0]
+        self._source_stat = source[1:]
+        self._pipelines = []
+        self._previewers = []
+        self._pending_seeks = {}
+        self._running = 0
+        self._start_time = 0
+
+    @staticmethod
+    def get_segments_count(duration):
+        """Number of pipelines to use for a file of that duration."""
+        count = Settings.get_default().waveform_analysis_pipelines
+        if count <= 0:
+            count = os.cpu_count() or 1
+        return max(1, min(count, int(duration // MIN_SEGMENT_DURATION)))
+
+    def get_filled_ranges(self):
+        """Return the (start, end) ranges of the already known samples."""
+        return [(previewer.start, previewer.filled)
+                for previewer in self._previewers]
+
+    def start(self):
+        """Launch the analysis pipelines."""
+        count = self.segments
+        if not count:
+            count = WaveformGenerator.get_segments_count(self.duration)
+        bounds = numpy.linspace(0, self.n_samples, count + 1).astype(int)
+        self._start_time = GLib.get_monotonic_time()
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            self._launch_pipeline(int(start), int(end))
+
+    def stop(self):
+        """Stop all the analysis pipelines."""
+        for pipeline in self._pipelines:
+            self._stop_pipeline(pipeline)
+        self._pipelines = []
+        self._pending_seeks = {}
+        self._running = 0
+
+    def _launch_pipeline(self, start, end):
+        pipeline = Gst.parse_launch("uridecodebin name=decode uri={} ! "
+                                    "waveformbin name=wave".format(self.uri))
+        # Decode as fast as possible, the CPU budget is enforced by
+        # capping the decoders threads and running the streaming threads
+        # reniced, in their own AnalysisTaskPool.
+        pipeline.connect("deep-element-added", self._element_added_cb)
+
+        wavebin = pipeline.get_by_name("wave")
+        wavebin.props.uri = self.uri
+        wavebin.set_range(self.samples, start, end)
+        decode = pipeline.get_by_name("decode")
+        decode.connect("autoplug-select", self._autoplug_select_cb)
+
+        # Preroll first, so the range can be seeked to.
+        self._pending_seeks[pipeline] = (start, end)
+        bus = pipeline.get_bus()
+        bus.enable_sync_message_emission()
+        bus.connect("sync-message::stream-status", self._stream_status_cb)
+        bus.add_signal_watch()
+        bus.connect("message::async-done", self.__on_bus_async_done,
+                    pipeline)
+        bus.connect("message::error", self.__on_bus_error, pipeline)
+        bus.connect("message::eos", self.__on_bus_eos, pipeline)
+        self._pipelines.append(pipeline)
+        self._previewers.append(wavebin)
+        self._running += 1
+        pipeline.set_state(Gst.State.PAUSED)
+
+    def _stop_pipeline(self, pipeline):
+        pipeline.set_state(Gst.State.NULL)
+        bus = pipeline.get_bus()
+        if bus:
+            bus.disconnect_by_func(self.__on_bus_async_done)
+            bus.disconnect_by_func(self.__on_bus_eos)
+            bus.disconnect_by_func(self.__on_bus_error)
+            bus.disconnect_by_func(self._stream_status_cb)
+            bus.disable_sync_message_emission()
+            bus.remove_signal_watch()
+
+    def __on_bus_async_done(self, unused_bus, unused_message, pipeline):
+        if pipeline not in self._pending_seeks:
+            return
+        start, end = self._pending_seeks.pop(pipeline)
+        stop_type = Gst.SeekType.NONE
+        if end < self.n_samples:
+            stop_type = Gst.SeekType.SET
+        pipeline.seek(1.0, Gst.Format.TIME,
+                      Gst.SeekFlags.FLUSH | Gst.SeekFlags.ACCURATE,
+                      Gst.SeekType.SET, int(start * SAMPLE_DURATION),
+                      stop_type, int(end * SAMPLE_DURATION))
+        pipeline.set_state(Gst.State.PLAYING)
+
+    def __on_bus_eos(self, unused_bus, unused_message, pipeline):
+        """On End of stream signal."""
+        self._stop_pipeline(pipeline)
+        self._pipelines.remove(pipeline)
+        self._running -= 1
+        if self._running > 0:
+            return
+        elapsed = GLib.get_monotonic_time() - self._start_time
+        if elapsed > 0:
+            # Duration is in ns and the monotonic time in µs
+            self.speed = self.duration / (elapsed * 1000)
+            Logger.debug("[WaveformGenerator] Waveform generated at "
+                         "{:.1f}x realtime".format(self.speed))
+        WaveformCache.get_default().save(self._cache_key, self.samples,
+                                         SAMPLE_DURATION, *self._source_stat)
+        self.emit("done")
+
+    def __on_bus_error(self, unused_bus, message, pipeline):
+        """On error signal."""
+        error = message.parse_error()[0].message
+        Logger.error("[WaveformGenerator] Stream Error: {}".format(error))
+        Gst.debug_bin_to_dot_file_with_ts(pipeline,
+                                          Gst.DebugGraphDetails.ALL,
+                                          "error-generating-waveforms")
+        self.stop()
+        self.emit("error", error)
+
+    def _element_added_cb(self, unused_pipeline, unused_bin, element):
+        max_threads = Settings.get_default().waveform_analysis_threads
+        if max_threads > 0 and element.find_property("max-threads"):
+            element.props.max_threads = max_threads
+
+    def _stream_status_cb(self, unused_bus, message):
+        # Called synchronously when a streaming task is created, before
+        # it gets a thread.
+        status_type = message.parse_stream_status()[0]
+        if status_type != Gst.StreamStatusType.CREATE:
+            return
+        task = message.get_stream_status_object()
+        if isinstance(task, Gst.Task):
+            task.set_pool(AnalysisTaskPool.get_default())
+
+    @staticmethod
+    def _autoplug_select_cb(unused_decode, unused_pad, unused_caps, factory):
+        # Don't plug video decoders / parsers.
+        if "Video" in factory.get_klass():
+            return True
+        return False
@@ -1,22 +1,39 @@
 #include <Python.h>
 #include <stdio.h>
+#include <string.h>
 #include <cairo.h>
 #include <py3cairo.h>
 #include <gst/gst.h>
 
 static GObjectClass * gobject_class;
 
+/*
+ * Read the i-th sample of a buffer holding either float or double values.
+ */
+static inline double
+get_sample (const char *buf, int is_double, Py_ssize_t i)
+{
+  if (is_double)
+    return ((const double *) buf)[i];
+  return ((const float *) buf)[i];
+}
+
 /*
  * This function must be called with a range of samples, and a desired
  * width and height.
+ * The samples can be any C-contiguous buffer of floats or doubles
+ * (a NumPy array, a memoryview or a mmap slice), no copy is made.
  * It will average samples if needed.
  */
 static PyObject *
 py_fill_surface (PyObject * self, PyObject * args)
 {
   PyObject *samples;
-  PyObject *sampleObj;
-  int length, i;
+  Py_buffer view;
+  Py_ssize_t length, i;
+  int is_double;
+  const char *buf;
+  const char *format;
   double sample;
   cairo_surface_t *surface;
   cairo_t *ctx;
@@ -27,10 +44,31 @@ py_fill_surface (PyObject * self, PyObject * args)
   float x = 0.;
   double accum;
 
-  if (!PyArg_ParseTuple (args, "O!ii", &PyList_Type, &samples, &width, &height))
+  if (!PyArg_ParseTuple (args, "Oii", &samples, &width, &height))
+    return NULL;
+
+  if (PyObject_GetBuffer (samples, &view,
+          PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0)
     return NULL;
 
-  length = PyList_Size (samples);
+  /* A NULL format means unsigned bytes, '@' and '=' native byte order */
+  format = view.format ? view.format : "B";
+  if (*format == '@' || *format == '=')
+    format++;
+
+  if ((strcmp (format, "f") != 0 && strcmp (format, "d") != 0) ||
+      view.itemsize != (*format == 'd' ? 8 : 4)) {
+    PyErr_SetString (PyExc_TypeError,
+        "samples must be a contiguous buffer of float32 or float64");
+    PyBuffer_Release (&view);
+    return NULL;
+  }
+
+  is_double = *format == 'd';
+  buf = view.buf;
+  length = view.len / view.itemsize;
+
+  Py_BEGIN_ALLOW_THREADS;
 
   surface = cairo_image_surface_create (CAIRO_FORMAT_ARGB32, width, height);
 
@@ -46,16 +84,7 @@ py_fill_surface (PyObject * self, PyObject * args)
   accum = 0.;
 
   for (i = 0; i < length; i++) {
-    /* Guaranteed to return something */
-    sampleObj = PyList_GetItem (samples, i);
-    sample = PyFloat_AsDouble (sampleObj);
-
-    /* If the object was not a float or convertible to float */
-    if (PyErr_Occurred ()) {
-      cairo_surface_finish (surface);
-      Py_DECREF (samples);
-      return NULL;
-    }
+    sample = get_sample (buf, is_double, i);
 
     currentPixel += pixelsPerSample;
     samplesInAccum += 1;
@@ -70,10 +99,14 @@ py_fill_surface (PyObject * self, PyObject * args)
     x += pixelsPerSample;
   }
 
-  Py_DECREF (samples);
   cairo_line_to (ctx, width, height);
   cairo_close_path (ctx);
   cairo_fill_preserve (ctx);
+  cairo_destroy (ctx);
+
+  Py_END_ALLOW_THREADS;
+
+  PyBuffer_Release (&view);
 
   return PycairoSurface_FromSurface (surface, NULL);
 }
@@ -0,0 +1,127 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import multiprocessing
+import os
+import sys
+from argparse import ArgumentParser
+from gettext import gettext as _
+
+from gi import require_version
+require_version('Gst', '1.0')
+require_version('GstPbutils', '1.0')
+from gi.repository import Gio, GLib, Gst, GstPbutils
+# The modules create GStreamer elements and caps once imported, and the
+# spawned workers import this module before running any initializer
+Gst.init(None)
+
+from .modules.log import Logger
+from .modules.waveform import WaveformGenerator, open_wavefile_for_uri
+
+
+def get_uris(paths):
+    """Return the URIs of the audio files of a list of paths or URIs."""
+    for path in paths:
+        if "://" in path:
+            yield path
+        elif os.path.isdir(path):
+            for root, _, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    filename = os.path.join(root, filename)
+                    content_type = Gio.content_type_guess(filename, None)[0]
+                    mimetype = Gio.content_type_get_mime_type(content_type)
+                    if mimetype and mimetype.startswith("audio/"):
+                        yield Gio.File.new_for_path(filename).get_uri()
+        else:
+            yield Gio.File.new_for_path(path).get_uri()
+
+
+def generate(uri):
+    """
+        Generate and cache the waveform of uri, in a worker process.
+        Return the uri, its duration in ns and the status of the generation.
+    """
+    try:
+        discoverer = GstPbutils.Discoverer.new(10 * Gst.SECOND)
+        duration = discoverer.discover_uri(uri).get_duration()
+    except GLib.Error as error:
+        return uri, 0, error.message
+    if open_wavefile_for_uri(uri):
+        return uri, duration, None
+
+    loop = GLib.MainLoop()
+    errors = []
+
+    def on_error(generator, error):
+        errors.append(error)
+        loop.quit()
+
+    # The worker processes already use every core
+    generator = WaveformGenerator(uri, duration, segments=1)
+    generator.connect("done", lambda *args: loop.quit())
+    generator.connect("error", on_error)
+    generator.start()
+    loop.run()
+    if errors:
+        return uri, duration, errors[0]
+    return uri, duration, "generated"
+
+
+def main(argv):
+    """Precompute the waveforms of audio files, without opening them."""
+    parser = ArgumentParser(description=_("Generate the waveforms of audio "
+                                          "files ahead of time"))
+    parser.add_argument("paths", nargs="*",
+                        help=_("Audio files, directories or URIs"))
+    parser.add_argument("-i", "--input", metavar="FILE",
+                        help=_("Read the files or URIs from FILE, "
+                               "one per line, - for stdin"))
+    parser.add_argument("-j", "--jobs", type=int,
+                        default=os.cpu_count() or 1,
+                        help=_("Number of worker processes"))
+    args = parser.parse_args(argv)
+
+    paths = list(args.paths)
+    if args.input == "-":
+        paths.extend(line.strip() for line in sys.stdin if line.strip())
+    elif args.input:
+        with open(args.input) as lines:
+            paths.extend(line.strip() for line in lines if line.strip())
+    uris = list(get_uris(paths))
+
+    generated = skipped = failed = 0
+    audio_duration = 0
+    start = GLib.get_monotonic_time()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(max(1, args.jobs)) as pool:
+        for uri, duration, status in pool.imap_unordered(generate, uris):
+            if status == "generated":
+                generated += 1
+                audio_duration += duration
+            elif status is None:
+                skipped += 1
+            else:
+                failed += 1
+                Logger.error("[Precompute] {}: {}".format(uri, status))
+    elapsed = (GLib.get_monotonic_time() - start) / 1000000
+
+    print(_("{} generated, {} up to date, {} failed in {:.1f}s").format(
+        generated, skipped, failed, elapsed))
+    if generated and elapsed > 0:
+        print(_("{:.1f} files/s, {:.1f}x realtime").format(
+            generated / elapsed, audio_duration / Gst.SECOND / elapsed))
+    return 1 if failed else 0
@@ -16,18 +16,21 @@ You should have received a copy of the GNU General Public License
 along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
 """
 from .objects import Time
-from hashlib import sha256
-from os import path, makedirs
-from gi.repository import GLib
+from gi.repository import Gio, GLib
 
 
-def get_wavefile_location_for_uri(uri):
-    filename = sha256(uri.encode("utf-8")).hexdigest()
-    cachedir = path.join(GLib.get_user_cache_dir(), "AudioCutter")
-    if not path.exists(cachedir):
-        makedirs(cachedir)
-    return path.join(cachedir, filename)
-
+def get_uri_stat(uri):
+    """Return the size and the modification time (in µs) of a URI."""
+    gfile = Gio.File.new_for_uri(uri)
+    try:
+        info = gfile.query_info("standard::size,time::modified,"
+                                "time::modified-usec",
+                                Gio.FileQueryInfoFlags.NONE, None)
+    except GLib.Error:
+        return 0, 0
+    seconds = info.get_attribute_uint64("time::modified")
+    useconds = info.get_attribute_uint32("time::modified-usec")
+    return info.get_size(), seconds * 1000000 + useconds
 
 
 def format_ns(nanoseconds):
@@ -28,7 +28,7 @@ class ActionBar(Gtk.ActionBar, GObject.GObject):
     # ToolBar Instance
     instance = None
     __gsignals__ = {
-        'selected-format': (GObject.SignalFlags.RUN_FIRST, None, (str, ))
+        'selected-formats': (GObject.SignalFlags.RUN_FIRST, None, (object, ))
     }
 
     def __init__(self):
@@ -36,7 +36,9 @@ class ActionBar(Gtk.ActionBar, GObject.GObject):
         Gtk.ActionBar.__init__(self)
         self.set_border_width(12)
         self._save_btn = Gtk.Button()
-        self._output_format = Gtk.ComboBox()
+        self._output_format = Gtk.MenuButton()
+        # mimetype: check button
+        self._format_btns = {}
         self._setup_widgets()
 
     @staticmethod
@@ -54,28 +56,42 @@ class ActionBar(Gtk.ActionBar, GObject.GObject):
         self._save_btn.get_style_context().add_class("suggested-action")
         self._save_btn.set_sensitive(False)
         self.pack_end(self._save_btn)
-        # Output format Combo box
-        model = Gtk.ListStore(str, str)
+        # Output formats popover, the selection is encoded to each of them
+        formats_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        formats_box.set_border_width(6)
         for mimetype, desc in AUDIO_MIMES.items():
-            model.append([desc, mimetype])
-        renderer_text = Gtk.CellRendererText()
-        self._output_format.pack_start(renderer_text, True)
-        self._output_format.add_attribute(renderer_text, "text", 0)
-        self._output_format.set_active(0)
-        self._output_format.set_model(model)
+            check_btn = Gtk.CheckButton(label=desc)
+            check_btn.connect("toggled", self._on_format_toggled)
+            formats_box.pack_start(check_btn, False, False, 0)
+            self._format_btns[mimetype] = check_btn
+        formats_box.show_all()
+        popover = Gtk.Popover()
+        popover.add(formats_box)
+        self._output_format.set_popover(popover)
         self._output_format.set_sensitive(False)
+        list(self._format_btns.values())[0].set_active(True)
         self.pack_end(self._output_format)
 
+    @property
+    def selected_formats(self):
+        """The checked output mimetypes."""
+        return [mimetype for mimetype, check_btn in self._format_btns.items()
+                if check_btn.get_active()]
+
     def set_state(self, state):
         """Set the ActionBar as active/inactive."""
-        self._save_btn.set_sensitive(state)
+        self._save_btn.set_sensitive(state and bool(self.selected_formats))
         self._output_format.set_sensitive(state)
 
+    def _on_format_toggled(self, check_btn):
+        selected = [AUDIO_MIMES[mimetype]
+                    for mimetype in self.selected_formats]
+        if selected:
+            self._output_format.set_label(", ".join(selected))
+        else:
+            self._output_format.set_label(_("No format"))
+        is_active = self._output_format.get_sensitive()
+        self._save_btn.set_sensitive(is_active and bool(selected))
+
     def _on_save(self, button):
-        active_id = self._output_format.get_active()
-        audio_mimes_keys = list(AUDIO_MIMES.keys())
-        try:
-            output_format = audio_mimes_keys[active_id]
-        except KeyError:
-            output_format = audio_mimes_keys[0]
-        self.emit("selected-format", output_format)
\ No newline at end of file
+        self.emit("selected-formats", self.selected_formats)
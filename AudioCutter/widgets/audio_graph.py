@@ -15,21 +15,33 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
 """
-import numpy
+import threading
+import weakref
+from collections import OrderedDict
+
 import cairo
-from os import path
 from gi import require_version
 require_version("Gtk", "3.0")
 require_version("GES", "1.0")
 from gi.repository import Gst, Gtk, GES, GObject, GLib, Gdk
 
-from ..modules import Player
-from ..utils import get_wavefile_location_for_uri
+from ..modules import PeakPyramid, WaveformGenerator
+from ..modules.waveform import SAMPLE_DURATION, lookup_wavefile_for_uri
 import renderer
 
 
-SAMPLE_DURATION = Gst.SECOND / 100
-MARGIN = 500
+# Width in pixels of the cached pieces of the waveform
+TILE_WIDTH = 256
+# Memory budget in bytes of the cached pieces of the waveform
+TILE_CACHE_SIZE = 64 * 1024 * 1024
+# Invalidated ranges remembered to check the tiles being rendered
+MAX_INVALIDATIONS = 64
+# Interval in ms between two redraws of a waveform being generated
+REFRESH_INTERVAL = 250
+# Delay in ms without zoom steps before the exact tiles are rendered
+ZOOM_SETTLE_DELAY = 150
+# Pixels scrolled per scroll wheel step
+SCROLL_STEP = 50
 
 
 class Zoomable(object):
@@ -43,69 +55,66 @@ class Zoomable(object):
     ex : 10.0 = 10 pixels for a second
     ex : 0.1 = 1 pixel for 10 seconds
     ex : 1.0 = 1 pixel for a second
+    Every instance has its own zoom, a new one starts at the zoom
+    level of the live instances.
      Class Methods
+    . pixelToNsAt(pixels, ratio)
+    . computeZoomRatio(level)
+    Instance Methods
     . pixelToNs(pixels)
     . nsToPixels(time)
     . setZoomRatio
-    Instance Methods
     . zoomChanged()
     """
 
-    sigid = None
-    _instances = []
+    # Weak references only, a destroyed view must not be kept alive
+    _instances = weakref.WeakSet()
     max_zoom = 1000.0
     min_zoom = 0.25
     zoom_steps = 100
     zoom_range = max_zoom - min_zoom
-    _cur_zoom = 20
-    zoomratio = None
-
+    default_zoom = 20
 
     def __init__(self):
-        # FIXME: ideally we should deprecate this
+        self._cur_zoom = Zoomable.default_zoom
+        for instance in Zoomable._instances:
+            self._cur_zoom = instance.getCurrentZoomLevel()
+            break
+        self.zoomratio = self.computeZoomRatio(self._cur_zoom)
         Zoomable.addInstance(self)
-        if Zoomable.zoomratio is None:
-            Zoomable.zoomratio = self.computeZoomRatio(self._cur_zoom)
-
-    def __del__(self):
-        if self in Zoomable._instances:
-            # FIXME: ideally we should deprecate this and spit a warning here
-            self._instances.remove(self)
 
     @classmethod
     def addInstance(cls, instance):
-        cls._instances.append(instance)
+        cls._instances.add(instance)
 
     @classmethod
     def removeInstance(cls, instance):
-        cls._instances.remove(instance)
+        cls._instances.discard(instance)
 
-    @classmethod
-    def setZoomRatio(cls, ratio):
-        ratio = min(max(cls.min_zoom, ratio), cls.max_zoom)
-        if cls.zoomratio != ratio:
-            cls.zoomratio = ratio
-            for inst in cls._instances:
-                inst.zoomChanged()
+    def setZoomRatio(self, ratio):
+        ratio = min(max(self.min_zoom, ratio), self.max_zoom)
+        if self.zoomratio != ratio:
+            self.zoomratio = ratio
+            self.zoomChanged()
 
-    @classmethod
-    def setZoomLevel(cls, level):
-        level = int(max(0, min(level, cls.zoom_steps)))
-        if level != cls._cur_zoom:
-            cls._cur_zoom = level
-            cls.setZoomRatio(cls.computeZoomRatio(level))
+    def setZoomLevel(self, level):
+        level = int(max(0, min(level, self.zoom_steps)))
+        if level != self._cur_zoom:
+            self._cur_zoom = level
+            self.queueZoomChange()
 
-    @classmethod
-    def getCurrentZoomLevel(cls):
-        return cls._cur_zoom
+    def queueZoomChange(self):
+        """Apply the current zoom level, subclasses may defer it."""
+        self.setZoomRatio(self.computeZoomRatio(self._cur_zoom))
 
-    @classmethod
-    def zoomIn(cls,  *args):
-        cls.setZoomLevel(cls._cur_zoom + 1)
+    def getCurrentZoomLevel(self):
+        return self._cur_zoom
 
-    @classmethod
-    def zoomOut(cls, *args):
-        cls.setZoomLevel(cls._cur_zoom - 1)
+    def zoomIn(self, *args):
+        self.setZoomLevel(self._cur_zoom + 1)
+
+    def zoomOut(self, *args):
+        self.setZoomLevel(self._cur_zoom - 1)
 
     @classmethod
     def computeZoomRatio(cls, x):
@@ -118,167 +127,171 @@ class Zoomable(object):
             (max(0, ratio - cls.min_zoom) /
                 cls.zoom_range) ** (1.0 / 3.0)) * cls.zoom_steps)
 
-    @classmethod
-    def pixelToNs(cls, pixel):
+    def pixelToNs(self, pixel):
         """Returns the duration equivalent of the specified pixel."""
-        return int(pixel * Gst.SECOND / cls.zoomratio)
+        return int(pixel * Gst.SECOND / self.zoomratio)
 
     @classmethod
     def pixelToNsAt(cls, pixel, ratio):
         """Returns the duration equivalent of the specified pixel."""
         return int(pixel * Gst.SECOND / ratio)
 
-    @classmethod
-    def nsToPixel(cls, duration):
+    def nsToPixel(self, duration):
         """Returns the pixel equivalent of the specified duration"""
         # Here, a long time ago (206f3a05), a pissed programmer said:
         # DIE YOU CUNTMUNCH CLOCK_TIME_NONE UBER STUPIDITY OF CRACK BINDINGS !!
         if duration == Gst.CLOCK_TIME_NONE:
             return 0
-        return int((float(duration) / Gst.SECOND) * cls.zoomratio)
+        return int((float(duration) / Gst.SECOND) * self.zoomratio)
 
-    @classmethod
-    def nsToPixelAccurate(cls, duration):
+    def nsToPixelAccurate(self, duration):
         """Returns the pixel equivalent of the specified duration."""
         # Here, a long time ago (206f3a05), a pissed programmer said:
         # DIE YOU CUNTMUNCH CLOCK_TIME_NONE UBER STUPIDITY OF CRACK BINDINGS !!
         if duration == Gst.CLOCK_TIME_NONE:
             return 0
-        return ((float(duration) / Gst.SECOND) * cls.zoomratio)
+        return ((float(duration) / Gst.SECOND) * self.zoomratio)
 
     def zoomChanged(self):
         pass
 
-class PreviewerBin(Gst.Bin):
-    """Baseclass for elements gathering datas to create previews."""
-
-    def __init__(self, bin_desc):
-        Gst.Bin.__init__(self)
-
-        self.internal_bin = Gst.parse_bin_from_description(bin_desc, True)
-        self.add(self.internal_bin)
-        self.add_pad(Gst.GhostPad.new(None, self.internal_bin.sinkpads[0]))
-        self.add_pad(Gst.GhostPad.new(None, self.internal_bin.srcpads[0]))
-
-    def finalize(self, proxy=None):
-        """Finalizes the previewer, saving data to the disk if needed."""
-        pass
-
 
-class WaveformPreviewer(PreviewerBin):
-    """Bin to generate and save waveforms as a .npy file."""
+class TileCache:
+    """
+        LRU cache of the rasterized waveform tiles.
+        Tiles are keyed by (zoom ratio, tile index, height) and the least
+        recently used ones are dropped once the memory budget is exceeded.
+    """
 
-    __gproperties__ = {
-        "uri": (str,
-                "uri of the media file",
-                "A URI",
-                "",
-                GObject.ParamFlags.READWRITE),
-        "duration": (GObject.TYPE_UINT64,
-                     "Duration",
-                     "Duration",
-                     0, GLib.MAXUINT64 - 1, 0, GObject.ParamFlags.READWRITE)
-    }
+    def __init__(self, max_size=TILE_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        # Bumped whenever cached tiles become outdated
+        self.version = 0
+        # (version, start, end) of the last invalidated ranges, the
+        # tiles rendered before the oldest one are all outdated
+        self._invalidations = []
+        self._oldest_version = 0
+        self._tiles = OrderedDict()
+
+    def get(self, key):
+        """Return the cached surface of a tile, None if it's not cached."""
+        surface = self._tiles.get(key)
+        if surface is not None:
+            self._tiles.move_to_end(key)
+        return surface
+
+    def add(self, key, surface):
+        """Cache the surface of a tile, evicting the oldest ones."""
+        self._remove(key)
+        self._tiles[key] = surface
+        self.size += TileCache._get_surface_size(surface)
+        while self.size > self.max_size and len(self._tiles) > 1:
+            self._remove(next(iter(self._tiles)))
+
+    def is_current(self, key, version):
+        """Whether a tile rendered at version still draws the samples."""
+        if version < self._oldest_version:
+            return False
+        for invalidated, start, end in self._invalidations:
+            if invalidated > version and TileCache._overlaps(key, start, end):
+                return False
+        return True
+
+    def invalidate(self, start, end):
+        """Drop the tiles drawing any sample between start and end (ns)."""
+        self.version += 1
+        self._invalidations.append((self.version, start, end))
+        if len(self._invalidations) > MAX_INVALIDATIONS:
+            self._oldest_version = self._invalidations.pop(0)[0]
+        for key in list(self._tiles):
+            if TileCache._overlaps(key, start, end):
+                self._remove(key)
+
+    def clear(self):
+        self.version += 1
+        self._invalidations = []
+        self._oldest_version = self.version
+        self._tiles.clear()
+        self.size = 0
+
+    @staticmethod
+    def _overlaps(key, start, end):
+        """Whether the tile of key draws any sample between start and end."""
+        ratio, index = key[:2]
+        tile_start = Zoomable.pixelToNsAt(index * TILE_WIDTH, ratio)
+        # A tile can read up to a pixel worth of samples past its end
+        tile_end = Zoomable.pixelToNsAt((index + 1) * TILE_WIDTH + 1, ratio)
+        return tile_start < end and start < tile_end
+
+    def _remove(self, key):
+        surface = self._tiles.pop(key, None)
+        if surface is not None:
+            self.size -= TileCache._get_surface_size(surface)
+
+    @staticmethod
+    def _get_surface_size(surface):
+        return surface.get_stride() * surface.get_height()
+
+
+class TileRenderer:
+    """
+        Rasterize the waveform tiles in a worker thread.
+        The rendered surfaces are handed to the callback from the main loop.
+    """
 
-    def __init__(self):
-        PreviewerBin.__init__(self,
-                              "audioconvert ! audioresample ! "
-                              "audio/x-raw,channels=1 ! level name=level"
-                              " ! audioconvert ! audioresample")
-        self.level = self.internal_bin.get_by_name("level")
-        self.peaks = None
-
-        self.uri = None
-        self.wavefile = None
-        self.passthrough = False
-        self.samples = []
-        self.n_samples = 0
-        self.duration = 0
-        self.prev_pos = 0
-
-    def do_get_property(self, prop):
-
-        if prop.name == 'uri':
-            return self.uri
-        elif prop.name == 'duration':
-            return self.duration
-        else:
-            raise AttributeError('unknown property %s' % prop.name)
-
-    def do_set_property(self, prop, value):
-        if prop.name == 'uri':
-            self.uri = value
-            self.wavefile = get_wavefile_location_for_uri(self.uri)
-            self.passthrough = path.exists(self.wavefile)
-        elif prop.name == 'duration':
-            self.duration = value
-            self.n_samples = self.duration / SAMPLE_DURATION
-        else:
-            raise AttributeError('unknown property %s' % prop.name)
-
-    # pylint: disable=arguments-differ
-    def do_post_message(self, message):
-        if not self.passthrough and \
-                message.type == Gst.MessageType.ELEMENT and \
-                message.src == self.level:
-            struct = message.get_structure()
-            peaks = None
-            if struct:
-                peaks = struct.get_value("rms")
-
-            if peaks:
-                stream_time = struct.get_value("stream-time")
-
-                if self.peaks is None:
-                    self.peaks = []
-                    for unused_channel in peaks:
-                        self.peaks.append([0] * int(self.n_samples))
-
-                pos = int(stream_time / SAMPLE_DURATION)
-                if pos >= len(self.peaks[0]):
+    def __init__(self, callback):
+        self._callback = callback
+        self._jobs = OrderedDict()
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self, key, version, samples, width, height):
+        """Queue the rendering of a tile, unless it is already queued."""
+        with self._condition:
+            if key not in self._jobs:
+                self._jobs[key] = (version, samples, width, height)
+                self._condition.notify()
+
+    def cancel(self):
+        """Drop all the queued tiles."""
+        with self._condition:
+            self._jobs.clear()
+
+    def stop(self):
+        with self._condition:
+            self._jobs.clear()
+            self._running = False
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._jobs:
+                    self._condition.wait()
+                if not self._running:
                     return
-
-                for i, val in enumerate(peaks):
-                    if val < 0:
-                        val = 10 ** (val / 20) * 100
-                    else:
-                        val = self.peaks[i][pos - 1]
-
-                    # Linearly joins values between to known samples values.
-                    unknowns = range(self.prev_pos + 1, pos)
-                    if unknowns:
-                        prev_val = self.peaks[i][self.prev_pos]
-                        linear_const = (val - prev_val) / len(unknowns)
-                        for temppos in unknowns:
-                            self.peaks[i][temppos] = self.peaks[i][temppos -
-                                                                   1] + linear_const
-
-                    self.peaks[i][pos] = val
-
-                self.prev_pos = pos
-
-        return Gst.Bin.do_post_message(self, message)
-
-    def finalize(self):
-        """Finalizes the previewer, saving data to file if needed."""
-        if not self.passthrough and self.peaks:
-            # Let's go mono.
-            if len(self.peaks) > 1:
-                samples = (numpy.array(
-                    self.peaks[0]) + numpy.array(self.peaks[1])) / 2
-            else:
-                samples = numpy.array(self.peaks[0])
-
-            self.samples = list(samples)
-            with open(self.wavefile, 'wb') as wavefile:
-                numpy.save(wavefile, samples)
-
-
-Gst.Element.register(None, "waveformbin", Gst.Rank.NONE, WaveformPreviewer)
+                key, (version, samples, width, height) = self._jobs.popitem(
+                    last=False)
+            # fill_surface releases the GIL while rasterizing
+            surface = renderer.fill_surface(samples, width, height)
+            GLib.idle_add(self._deliver, key, version, surface)
+
+    def _deliver(self, key, version, surface):
+        if self._running:
+            self._callback(key, version, surface)
+        return False
 
 
 class AudioGraph(Gtk.Layout, Zoomable):
-    """The graph of the audio."""
+    """
+        The graph of the audio.
+        Only the time range visible in the allocation is drawn, starting
+        at offset, so the waveform width isn't limited by the pixels
+        GTK and cairo can address.
+    """
 
     __gsignals__ = {
         'draw-done': (GObject.SignalFlags.RUN_FIRST, None, ()),
@@ -291,143 +304,283 @@ class AudioGraph(Gtk.Layout, Zoomable):
 
         self._asset = asset
         self._uri = uri
-        self.wavefile = None
-        self.pipeline = None
-        self._wavebin = None
+        self._generator = None
+        # Cache key and stat of the media, once looked up
+        self._source = None
+        self._is_destroyed = False
+        self._num_failures = 0
         self.n_samples = asset.get_duration() / SAMPLE_DURATION
         self.samples = None
-        self._force_redraw = True
-        self.peaks = None
+        self.pyramid = None
+        self._tiles = TileCache()
+        self._tile_renderer = TileRenderer(self._tile_rendered_cb)
+        # Zoom ratio of the last fully drawn waveform
+        self._last_ratio = None
         self.discovered = False
-        self._start = 0
-        self._end = 0
-        self._surface_x = 0
+        # Samples already drawn, per analysed range
+        self._filled = []
+        self._refresh_id = 0
+        # Timestamp in ns of the left edge of the viewport
+        self.offset = 0
+        self._zoom_tick_id = 0
+        # Pending while the zoom is being changed
+        self._zoom_settle_id = 0
+        # How fast the waveform was generated, times realtime
+        self.analysis_speed = None
         self._start_levels_discovery()
+        self.add_events(Gdk.EventMask.SCROLL_MASK)
+        self.add_events(Gdk.EventMask.SMOOTH_SCROLL_MASK)
+        self.connect("scroll-event", self._scroll_cb)
         self.connect("notify::height-request", self._height_changed_cb)
+        self.connect("destroy", self._destroy_cb)
         self.show_all()
 
-
     def emit(self, *args):
         GLib.idle_add(GObject.GObject.emit, self, *args)
 
     def _launch_pipeline(self):
-        self.pipeline = Gst.parse_launch("uridecodebin name=decode uri=" +
-                                         self._uri + " ! waveformbin name=wave"
-                                         " ! fakesink qos=false name=faked")
-
-        Gst.ElementFactory.make("uritranscodebin", None)
-
-        clock = GObject.new(GObject.type_from_name("GstCpuThrottlingClock"))
-        clock.props.cpu_usage = 90
-        self.pipeline.use_clock(clock)
-
-        faked = self.pipeline.get_by_name("faked")
-        faked.props.sync = True
-        self._wavebin = self.pipeline.get_by_name("wave")
-
-        self._wavebin.props.uri = self._asset.get_id()
-        self._wavebin.props.duration = self._asset.get_duration()
-        decode = self.pipeline.get_by_name("decode")
-        decode.connect("autoplug-select", self._autoplug_select_cb)
-        bus = self.pipeline.get_bus()
-        self.pipeline.set_state(Gst.State.PLAYING)
-        bus.add_signal_watch()
-        self.n_samples = self._asset.get_duration() / SAMPLE_DURATION
-        bus.connect("message::error", self.__on_bus_error)
-        bus.connect("message::eos", self.__on_bus_eos)
-
-    def __disconnect_bus(self):
-        bus = self.pipeline.get_bus()
-        if bus:
-            bus.disconnect_by_func(self.__on_bus_eos)
-            bus.disconnect_by_func(self.__on_bus_error)
-
-    def __on_bus_eos(self, bus, message):
-        """On End of stream signal."""
-        self._prepare_samples()
-        self._start_rendering()
+        self._generator = WaveformGenerator(self._uri,
+                                            self._asset.get_duration(),
+                                            source=self._source)
+        self._generator.connect("done", self._on_generation_done)
+        self._generator.connect("error", self._on_generation_error)
+        self._generator.start()
+
+        # Draw the peaks as they get collected
+        self.samples = self._generator.samples
+        self.pyramid = PeakPyramid(self.samples)
+        self._filled = self._generator.get_filled_ranges()
+        self._refresh_id = GLib.timeout_add(REFRESH_INTERVAL,
+                                            self._refresh_progress)
+
+    def _on_generation_done(self, generator):
+        self.analysis_speed = generator.speed
+        self._refresh_progress()
         self.stop_generation()
-    
-    def __on_bus_error(self, bus, message):
-        """On error signal."""
+        self._start_rendering()
+
+    def _on_generation_error(self, *args):
         self.stop_generation()
         self._num_failures += 1
         if self._num_failures < 2:
-            self.__disconnect_bus()
             self._launch_pipeline()
-        elif self.pipeline:
-            Gst.debug_bin_to_dot_file_with_ts(self.pipeline,
-                                              Gst.DebugGraphDetails.ALL,
-                                              "error-generating-waveforms")
 
     def _height_changed_cb(self, *args):
-        self._force_redraw = True
         self.queue_draw()
 
-    def _autoplug_select_cb(self, unused_decode, unused_pad, unused_caps, factory):
-        # Don't plug video decoders / parsers.
-        if "Video" in factory.get_klass():
-            return True
-        return False
+    def set_offset(self, offset):
+        """Scroll the viewport so it starts at offset, in ns."""
+        visible = self.pixelToNs(self.get_allocated_width())
+        last = max(0, self._asset.get_duration() - visible)
+        offset = int(min(max(0, offset), last))
+        if offset != self.offset:
+            self.offset = offset
+            # The queued tiles may be out of view, the redraw requests
+            # the visible ones again
+            self._tile_renderer.cancel()
+            self.queue_draw()
+
+    def _queue_draw_pixels(self, first, last):
+        """Redraw the visible part of [first, last), in timeline pixels."""
+        origin = self.nsToPixel(self.offset)
+        first = max(first - origin, 0)
+        last = min(last - origin, self.get_allocated_width())
+        if first < last:
+            self.queue_draw_area(first, 0, last - first,
+                                 self.get_allocated_height())
+
+    def _scroll_cb(self, widget, event):
+        if event.direction == Gdk.ScrollDirection.SMOOTH:
+            _, delta_x, delta_y = event.get_scroll_deltas()
+        elif event.direction in (Gdk.ScrollDirection.UP,
+                                 Gdk.ScrollDirection.LEFT):
+            delta_x, delta_y = -1, 0
+        else:
+            delta_x, delta_y = 1, 0
+        if event.state & Gdk.ModifierType.CONTROL_MASK:
+            # Zoom in when scrolling up
+            delta = delta_x + delta_y
+            if delta < 0:
+                self.zoomIn()
+            elif delta > 0:
+                self.zoomOut()
+        else:
+            delta = (delta_x + delta_y) * SCROLL_STEP
+            self.set_offset(self.offset + self.pixelToNs(delta))
+        return True
 
-    def _prepare_samples(self):
-        self._wavebin.finalize()
-        self.samples = self._wavebin.samples
+    def _destroy_cb(self, *args):
+        self._is_destroyed = True
+        self.stop_generation()
+        self._tile_renderer.stop()
+        if self._zoom_tick_id:
+            self.remove_tick_callback(self._zoom_tick_id)
+            self._zoom_tick_id = 0
+        if self._zoom_settle_id:
+            GLib.source_remove(self._zoom_settle_id)
+            self._zoom_settle_id = 0
+        Zoomable.removeInstance(self)
+
+    def _refresh_progress(self):
+        """Extend the drawn waveform with the newly collected peaks."""
+        ranges = self._generator.get_filled_ranges()
+        for (_, drawn), (_, filled) in zip(self._filled, ranges):
+            if filled <= drawn:
+                continue
+            self.pyramid.update(drawn, filled)
+            if self.discovered:
+                # Only the newly filled region needs to be redrawn
+                start = drawn * SAMPLE_DURATION
+                end = filled * SAMPLE_DURATION
+                self._tiles.invalidate(start, end)
+                self._queue_draw_pixels(self.nsToPixel(start),
+                                        self.nsToPixel(end) + 1)
+        self._filled = ranges
+        if not self.discovered:
+            self._start_rendering()
+        return True
 
     def _start_rendering(self):
         self.n_samples = len(self.samples)
-        self.discovered = True
+        if self.pyramid is None:
+            self.pyramid = PeakPyramid(self.samples)
+        self._tiles.clear()
         self.queue_draw()
-        self.emit("draw-done")
+        if not self.discovered:
+            self.discovered = True
+            self.emit("draw-done")
 
     def start_generation(self):
         self._start_levels_discovery()
-        if not self.pipeline:
-            # No need to generate as we loaded pre-generated .wave file.
-            return
-        self.pipeline.set_state(Gst.State.PLAYING)
 
     def stop_generation(self):
-        if self.pipeline:
-            self.pipeline.set_state(Gst.State.NULL)
-            self.__disconnect_bus()
-            self.pipeline = None
+        if self._refresh_id:
+            GLib.source_remove(self._refresh_id)
+            self._refresh_id = 0
+        if self._generator:
+            self._generator.stop()
+            self._generator.disconnect_by_func(self._on_generation_done)
+            self._generator.disconnect_by_func(self._on_generation_error)
+            self._generator = None
+
+    def queueZoomChange(self):
+        # Zoom steps coming faster than frames are only applied once
+        if not self.get_mapped():
+            Zoomable.queueZoomChange(self)
+        elif not self._zoom_tick_id:
+            self._zoom_tick_id = self.add_tick_callback(self._zoom_tick_cb)
+
+    def _zoom_tick_cb(self, widget, frame_clock):
+        self._zoom_tick_id = 0
+        Zoomable.queueZoomChange(self)
+        return GLib.SOURCE_REMOVE
+
+    def setZoomRatio(self, ratio):
+        # Keep the middle of the viewport in place
+        half_width = self.get_allocated_width() / 2
+        center = self.offset + self.pixelToNs(half_width)
+        Zoomable.setZoomRatio(self, ratio)
+        self.set_offset(center - self.pixelToNs(half_width))
 
     def zoomChanged(self):
-        self._force_redraw = True
+        # The queued tiles are for the previous zoom level
+        self._tile_renderer.cancel()
+        # Only show the scaled tiles until the zoom stops changing
+        if self._zoom_settle_id:
+            GLib.source_remove(self._zoom_settle_id)
+        self._zoom_settle_id = GLib.timeout_add(ZOOM_SETTLE_DELAY,
+                                                self._zoom_settled_cb)
+        self.queue_draw()
+
+    def _zoom_settled_cb(self):
+        self._zoom_settle_id = 0
         self.queue_draw()
+        return False
 
     def do_draw(self, context):
         if not self.discovered:
             return
 
         clipped_rect = Gdk.cairo_get_clip_rectangle(context)[1]
-
-        num_inpoint_samples = self._get_num_inpoint_samples()
-        drawn_start = self.pixelToNs(clipped_rect.x)
-        drawn_duration = self.pixelToNs(clipped_rect.width)
-        start = int(drawn_start / SAMPLE_DURATION) + num_inpoint_samples
-        end = int((drawn_start + drawn_duration) /
-                  SAMPLE_DURATION) + num_inpoint_samples
-
-        if self._force_redraw or self._surface_x > clipped_rect.x or self._end < end:
-            self._start = start
-            end = int(min(self.n_samples, end + (self.pixelToNs(MARGIN) /
-                                                 SAMPLE_DURATION)))
-            self._end = end
-            self._surface_x = clipped_rect.x
-            surface_width = min(self.get_parent().get_allocation().width - clipped_rect.x,
-                                clipped_rect.width + MARGIN)
-            surface_height = int(self.get_parent().get_allocation().height)
-            self.surface = renderer.fill_surface(self.samples[start:end],
-                                                 surface_width,
-                                                 surface_height)
-
-            self._force_redraw = False
+        height = self.get_allocated_height()
+        # Tiles are indexed in timeline pixels, which may be far beyond
+        # what cairo can address, only draw relative to the viewport
+        origin = self.nsToPixel(self.offset)
+        first_x = origin + clipped_rect.x
+        first_tile = first_x // TILE_WIDTH
+        last_tile = (first_x + clipped_rect.width - 1) // TILE_WIDTH
 
         context.set_operator(cairo.OPERATOR_OVER)
-        context.set_source_surface(self.surface, self._surface_x, 0)
-        context.paint()
+        complete = True
+        for index in range(first_tile, last_tile + 1):
+            key = (self.zoomratio, index, height)
+            surface = self._tiles.get(key)
+            if surface is None:
+                if not self._zoom_settle_id:
+                    job = self._get_tile_job(index, height)
+                    if job is None:
+                        # Past the end of the file
+                        break
+                    self._tile_renderer.request(key, self._tiles.version,
+                                                *job)
+                # Paint the previous zoom level until the tile is ready
+                self._paint_scaled_tile(context, index, height, origin)
+                complete = False
+                continue
+            context.set_source_surface(surface, index * TILE_WIDTH - origin,
+                                       0)
+            context.paint()
+        if complete:
+            self._last_ratio = self.zoomratio
+
+    def _paint_scaled_tile(self, context, index, height, origin):
+        """Paint the tiles of the last complete zoom level over a tile."""
+        if self._last_ratio is None or self._last_ratio == self.zoomratio:
+            return
+        scale = self.zoomratio / self._last_ratio
+        first = int(index * TILE_WIDTH / scale) // TILE_WIDTH
+        last = int((index + 1) * TILE_WIDTH / scale) // TILE_WIDTH
+        context.save()
+        context.rectangle(index * TILE_WIDTH - origin, 0, TILE_WIDTH, height)
+        context.clip()
+        for old_index in range(first, last + 1):
+            surface = self._tiles.get((self._last_ratio, old_index, height))
+            if surface is not None:
+                context.save()
+                context.translate(old_index * TILE_WIDTH * scale - origin, 0)
+                context.scale(scale, 1)
+                context.set_source_surface(surface, 0, 0)
+                context.paint()
+                context.restore()
+        context.restore()
+
+    def _tile_rendered_cb(self, key, version, surface):
+        ratio, index, height = key
+        if self._tiles.is_current(key, version):
+            self._tiles.add(key, surface)
+        # Outdated tiles are requested again by the redraw
+        if ratio == self.zoomratio:
+            self._queue_draw_pixels(index * TILE_WIDTH,
+                                    (index + 1) * TILE_WIDTH)
+
+    def _get_tile_job(self, index, height):
+        """Return the samples, width and height of the tile at index."""
+        num_inpoint_samples = self._get_num_inpoint_samples()
+        tile_x = index * TILE_WIDTH
+        start = self.pixelToNs(tile_x) // SAMPLE_DURATION
+        end = self.pixelToNs(tile_x + TILE_WIDTH) // SAMPLE_DURATION
+        start = int(start) + num_inpoint_samples
+        end = int(min(self.n_samples, end + num_inpoint_samples))
+        if start >= end:
+            return None
+        width = min(TILE_WIDTH,
+                    self.nsToPixel(end * SAMPLE_DURATION) - tile_x)
+        if width <= 0:
+            return None
+        # Pick the pyramid level matching the current zoom ratio
+        level = self.pyramid.get_level(self.pixelToNs(1) / SAMPLE_DURATION)
+        samples = level.mean[start // level.factor:end // level.factor]
+        return samples, width, height
 
     def _get_num_inpoint_samples(self):
         asset_duration = self._asset.get_duration()
@@ -435,14 +588,18 @@ class AudioGraph(Gtk.Layout, Zoomable):
         return int(self.n_samples / (float(asset_duration)) / 1)
 
     def _start_levels_discovery(self, *args):
-        # Get the wavefile location
-        filename = get_wavefile_location_for_uri(self._uri)
-        if path.exists(filename):
-            # If the wavefile exists, use it to draw the waveform
-            with open(filename, "rb") as samples:
-                self.samples = list(numpy.load(samples))
+        # The loading state stays until the waveform starts being drawn
+        lookup_wavefile_for_uri(self._uri, self._wavefile_found_cb)
+
+    def _wavefile_found_cb(self, wavefile, source):
+        if self._is_destroyed:
+            return False
+        self._source = source
+        if wavefile:
+            # If an up to date wavefile exists, use it to draw the waveform
+            self.samples = wavefile.samples
             self._start_rendering()
         else:
-            # Otherwise launch the pipeline
-            self.wavefile = filename
+            # Otherwise launch the pipelines
             self._launch_pipeline()
+        return False
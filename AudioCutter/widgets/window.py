@@ -24,7 +24,8 @@ from .soundconfig import SoundConfig
 from .zoombox import ZoomBox
 from .notification import Notification
 from .audio_graph import AudioGraph
-from ..modules import Logger, Player, Settings, Exporter
+from ..modules import (Logger, Player, Settings, Exporter, ExportJob,
+                       ExportQueue)
 from ..const import AUDIO_MIMES
 from .loading import Loading
 
@@ -41,6 +42,8 @@ class Window(Gtk.ApplicationWindow):
         Gtk.Window.__init__(self)
         self.connect("delete-event", lambda x, y: self._on_close())
         self._main = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        # (button, handler id) of the zoom buttons connected to the graph
+        self._zoom_handlers = []
         self._setup_window()
         self._setup_widgets()
         self._restore_state()
@@ -77,7 +80,7 @@ class Window(Gtk.ApplicationWindow):
 
         # Action Bar
         actionbar = ActionBar.get_default()
-        actionbar.connect("selected-format", self._on_export)
+        actionbar.connect("selected-formats", self._on_export)
         self._main.pack_end(actionbar, False, False, 0)
 
         # Notification
@@ -160,12 +163,19 @@ class Window(Gtk.ApplicationWindow):
         Settings.get_default().last_file = f.get_uri()
 
         audio_graph = AudioGraph(f.get_uri(), player.asset)
+        # The previous graph must not be kept alive by the zoom buttons
+        for button, handler_id in self._zoom_handlers:
+            button.disconnect(handler_id)
         for child in self.audio_graph_box.get_children():
-            self.audio_graph_box.remove(child)
+            child.destroy()
         self.audio_graph_box.pack_start(audio_graph, True, True, 0)
         audio_graph.connect("draw-done", self._on_waveform_ready)
-        self.zoombox.zoom_up.connect("clicked", audio_graph.zoomIn)
-        self.zoombox.zoom_down.connect("clicked", audio_graph.zoomOut)
+        self._zoom_handlers = [
+            (self.zoombox.zoom_up,
+             self.zoombox.zoom_up.connect("clicked", audio_graph.zoomIn)),
+            (self.zoombox.zoom_down,
+             self.zoombox.zoom_down.connect("clicked", audio_graph.zoomOut))
+        ]
 
     def _on_waveform_ready(self, *args):
         loading = self.main_stack.get_child_by_name("loading")
@@ -176,18 +186,56 @@ class Window(Gtk.ApplicationWindow):
         sound_config = SoundConfig.get_default()
         sound_config.start_time.step_up()
 
-    def _on_export(self, action_bar, audio_format):
+    def _on_export(self, action_bar, audio_formats):
         sound_config = SoundConfig.get_default()
         is_fade_in = sound_config.is_fade_in
         is_fade_out = sound_config.is_fade_out
         start_time = sound_config.start_time.time.total
         end_time = sound_config.end_time.time.total
-        audio_path = Player.get_default().uri
-        exporter = Exporter(start_time=start_time, end_time=end_time,
-                            is_fade_in=is_fade_in, is_fade_out=is_fade_out,
-                            path=audio_path, audio_format=audio_format)
-        exporter.do()
+        player = Player.get_default()
+        output = self._ask_export_location(audio_formats[0])
+        if not output:
+            Logger.debug("Export dialog closed without selecting a file.")
+            return
+        # Every format is encoded from a single decode of the selection
+        job = ExportJob(start_time=start_time, end_time=end_time,
+                        is_fade_in=is_fade_in, is_fade_out=is_fade_out,
+                        path=player.uri, audio_formats=audio_formats,
+                        output=output, info=player.asset.get_info())
+        job.connect("progress", self._on_export_progress)
+        job.connect("finished", self._on_export_finished)
+        job.connect("error", self._on_export_error)
+        ExportQueue.get_default().add(job)
+
+    def _ask_export_location(self, audio_format):
+        """Ask where to export, return the chosen path or None."""
+        file_chooser = Gtk.FileChooserNative()
+        file_chooser.set_action(Gtk.FileChooserAction.SAVE)
+        file_chooser.set_transient_for(self)
+        file_chooser.set_accept_label(_("Save"))
+        file_chooser.set_cancel_label(_("Cancel"))
+        file_chooser.set_do_overwrite_confirmation(True)
+        title = path.splitext(Player.get_default().filepath.get_basename())[0]
+        extension = Exporter.get_extension(audio_format)
+        file_chooser.set_current_name("{}.{}".format(title, extension))
+        response = file_chooser.run()
+        filename = None
+        if response == Gtk.ResponseType.ACCEPT:
+            filename = file_chooser.get_filename()
+        file_chooser.destroy()
+        return filename
+
+    def _on_export_progress(self, job, progress):
+        Notification.get_default().message = _("Exporting… {}%").format(
+            int(progress * 100))
+
+    def _on_export_finished(self, job):
+        Notification.get_default().message = _("Saved to {}").format(
+            ", ".join(job.outputs))
 
+    def _on_export_error(self, job, error):
+        Notification.get_default().message = _("Export failed: {}").format(
+            error)
 
     def _toggle_popover(self, button, popover):
         """Toggle the app menu popover."""
@@ -213,5 +261,6 @@ class Window(Gtk.ApplicationWindow):
     def _on_close(self):
         """Window delete event handler."""
         # TODO: ask the user if he wants to save the current modification?
+        ExportQueue.get_default().cancel_all()
         # Save the latest window position
         Settings.get_default().window_position = self.get_position()
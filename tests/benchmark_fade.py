@@ -0,0 +1,122 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+Licence : The script is released under GPL, uses a modified script
+     form Chromium project released under BSD license
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+"""
+    Measure the cost of the fade stage over a long export: the buffers
+    go through Fade.apply as in the export pipeline, only the ones in
+    the fade windows are scaled. The baseline scales every buffer, as a
+    volume element driven by a controller does.
+    With GStreamer available, a whole export branch is also timed with
+    and without its FadeFilter element.
+
+    Usage: python3 tests/benchmark_fade.py [hours]
+"""
+import sys
+import time
+
+import numpy
+
+from test_wavefile import load_module
+
+Fade = load_module("fade").Fade
+try:
+    from gi import require_version
+    require_version('Gst', '1.0')
+    from gi.repository import Gst
+    # FadeFilter creates its pad templates once imported
+    Gst.init(None)
+    exporter = load_module("exporter")
+except (ImportError, ValueError):
+    Gst = None
+
+RATE = 48000
+CHANNELS = 2
+# Frames of a typical decoded buffer
+BUFFER_FRAMES = 1024
+FADE_SECONDS = 3
+
+
+def run(fade, length, samples, is_baseline=False):
+    """Push length frames through the fade, return the elapsed seconds."""
+    ones = numpy.ones(BUFFER_FRAMES)
+    start = time.perf_counter()
+    for first in range(0, length, BUFFER_FRAMES):
+        if is_baseline:
+            Fade.scale(samples, ones)
+        else:
+            fade.apply(samples, first)
+    return time.perf_counter() - start
+
+
+def run_branch(hours, is_faded):
+    """Push hours of audio through an export branch, return its time."""
+    length = int(hours * 3600 * RATE)
+    pipeline = Gst.parse_launch(
+        "audiotestsrc num-buffers={} samplesperbuffer={} "
+        "! audio/x-raw,format=S16LE,rate={},channels={} "
+        "! queue ! audioresample ! audioconvert name=convert".format(
+            length // BUFFER_FRAMES, BUFFER_FRAMES, RATE, CHANNELS))
+    convert = pipeline.get_by_name("convert")
+    sink = Gst.ElementFactory.make("fakesink", None)
+    sink.props.sync = False
+    pipeline.add(sink)
+    if is_faded:
+        region = exporter.ExportRegion(0, hours * 3600, "", "audio/x-wav",
+                                       True, True)
+        fade = exporter.FadeFilter(region, Fade.LINEAR)
+        pipeline.add(fade)
+        convert.link(fade)
+        fade.link(sink)
+    else:
+        convert.link(sink)
+    start = time.perf_counter()
+    pipeline.set_state(Gst.State.PLAYING)
+    pipeline.get_bus().timed_pop_filtered(
+        Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    elapsed = time.perf_counter() - start
+    pipeline.set_state(Gst.State.NULL)
+    return elapsed
+
+
+def main(hours):
+    length = int(hours * 3600 * RATE)
+    random = numpy.random.RandomState(0)
+    samples = random.uniform(-1, 1, (BUFFER_FRAMES, CHANNELS))
+    samples = samples.astype(numpy.float32)
+    header = ("stage", "time (s)", "x realtime")
+    print("{:>20} {:>12} {:>12}".format(*header))
+    rows = [("scale every buffer", None, True),
+            ("no fades", Fade(length), False)]
+    for curve in Fade.CURVES:
+        rows.append((curve, Fade(length, FADE_SECONDS * RATE,
+                                 FADE_SECONDS * RATE, curve), False))
+    for name, fade, is_baseline in rows:
+        elapsed = run(fade, length, samples, is_baseline)
+        print("{:>20} {:>12.2f} {:>12.0f}".format(
+            name, elapsed, hours * 3600 / elapsed))
+    if Gst is None:
+        return
+    for name, is_faded in (("branch", False), ("branch + fades", True)):
+        elapsed = run_branch(hours, is_faded)
+        print("{:>20} {:>12.2f} {:>12.0f}".format(
+            name, elapsed, hours * 3600 / elapsed))
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,93 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+Licence : The script is released under GPL, uses a modified script
+     form Chromium project released under BSD license
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+"""
+    Compare the cached waveform encodings: disk size, time to open the
+    cache and build the peaks pyramid, and the resulting peak RSS.
+    The baseline is the former float64 .npy cache.
+
+    Usage: python3 tests/benchmark_wavefile.py [hours]
+"""
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from os import path
+from tempfile import TemporaryDirectory
+
+import numpy
+
+from test_wavefile import WaveFile, peaks
+
+# One peak per 10ms
+SAMPLES_PER_HOUR = 360000
+
+
+def load(filename, encoding):
+    """Open the cache and build its pyramid, in a fresh process."""
+    start = time.perf_counter()
+    if encoding == "npy":
+        samples = numpy.load(filename)
+    else:
+        samples = WaveFile.open(filename).samples
+    pyramid = peaks.PeakPyramid(samples)
+    elapsed = time.perf_counter() - start
+    # Fetch a screen worth of the most detailed level, as when drawing
+    pyramid.get_level(1).mean[len(samples) // 2:len(samples) // 2 + 2048]
+    return elapsed, get_peak_rss()
+
+
+def get_peak_rss():
+    """Peak RSS in KiB, ru_maxrss survives exec so prefer VmHWM."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main(hours):
+    random = numpy.random.RandomState(0)
+    samples = random.rand(int(hours * SAMPLES_PER_HOUR)) ** 3 * 100
+    context = multiprocessing.get_context("spawn")
+    header = ("encoding", "size (KiB)", "load (ms)", "RSS (MiB)")
+    print("{:>12} {:>12} {:>12} {:>12}".format(*header))
+    with TemporaryDirectory() as directory:
+        for encoding in ["npy"] + list(WaveFile.ENCODINGS):
+            filename = path.join(directory, encoding)
+            if encoding == "npy":
+                filename += ".npy"
+                numpy.save(filename, samples)
+            else:
+                WaveFile.save(filename, samples, 10, 0, 0,
+                              WaveFile.ENCODINGS[encoding])
+            # A fresh process each time so the peak RSS is not shared
+            with context.Pool(1) as pool:
+                elapsed, rss = pool.apply(load, (filename, encoding))
+            print("{:>12} {:>12.0f} {:>12.1f} {:>12.1f}".format(
+                encoding, os.stat(filename).st_size / 1024,
+                elapsed * 1000, rss / 1024))
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10)
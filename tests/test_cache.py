@@ -0,0 +1,147 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+Licence : The script is released under GPL, uses a modified script
+     form Chromium project released under BSD license
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import time
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+import numpy
+
+from test_wavefile import load_module, use_settings_schema
+
+try:
+    from gi.repository import Gio
+    cache = load_module("cache")
+    settings = load_module("settings")
+except ImportError:
+    cache = None
+# Compiled schema, kept while the tests run
+SCHEMA_DIRECTORY = TemporaryDirectory()
+SAMPLE_DURATION = 10000000
+
+
+def setUpModule():
+    if cache is not None:
+        use_settings_schema(SCHEMA_DIRECTORY.name)
+
+
+@unittest.skipIf(cache is None, "GLib is not available")
+class TestWaveformCache(unittest.TestCase):
+    """Test the eviction, the accounting and the index of the cache."""
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        settings.Settings.get_default().waveform_cache_size = 1
+        self.cache = self.open_cache()
+        # About 400 KiB each, the cache holds two of them
+        self.samples = numpy.ones(100000, numpy.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_cache(self):
+        waveform_cache = cache.WaveformCache(self.directory.name)
+        self.wait_trim(waveform_cache)
+        return waveform_cache
+
+    @staticmethod
+    def wait_trim(waveform_cache):
+        deadline = time.monotonic() + 10
+        while waveform_cache._trimming and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def save(self, key, source_size=1234):
+        self.cache.save(key, self.samples, SAMPLE_DURATION, source_size, 0)
+        self.wait_trim(self.cache)
+
+    def exists(self, key):
+        return path.exists(self.cache.get_location(key))
+
+    def test_least_recently_used(self):
+        """Test the least recently used waveforms are evicted first."""
+        self.save("a")
+        self.save("b")
+        os.utime(self.cache.get_location("a"), (100, 100))
+        os.utime(self.cache.get_location("b"), (200, 200))
+        # Opening a waveform marks it as recently used
+        self.assertIsNotNone(self.cache._open("a", SAMPLE_DURATION, 1234))
+        self.save("c")
+        self.assertTrue(self.exists("a"))
+        self.assertFalse(self.exists("b"))
+        self.assertTrue(self.exists("c"))
+
+    def test_stats(self):
+        """Test the entries, their size, the hits and misses are counted."""
+        self.save("a")
+        size = os.stat(self.cache.get_location("a")).st_size
+        self.assertEqual(self.cache.stats["entries"], 1)
+        self.assertEqual(self.cache.stats["bytes"], size)
+        # Saved again with fewer samples
+        self.samples = self.samples[:1000]
+        self.save("a")
+        self.assertEqual(self.cache.stats["entries"], 1)
+        self.assertEqual(self.cache.stats["bytes"],
+                         os.stat(self.cache.get_location("a")).st_size)
+        self.cache._open("a", SAMPLE_DURATION, 1234)
+        # Outdated, and missing
+        self.cache._open("a", SAMPLE_DURATION, 4321)
+        self.cache._open("b", SAMPLE_DURATION, 1234)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 2)
+        # Scanned again by a new instance
+        stats = self.open_cache().stats
+        self.assertEqual((stats["entries"], stats["bytes"]),
+                         (1, self.cache.stats["bytes"]))
+
+    def test_index(self):
+        """Test the URI index is appended to, then compacted."""
+        max_entries = cache.WaveformCache.MAX_INDEX_ENTRIES
+        cache.WaveformCache.MAX_INDEX_ENTRIES = 2
+        self.addCleanup(setattr, cache.WaveformCache, "MAX_INDEX_ENTRIES",
+                        max_entries)
+        uris = []
+        for index in range(5):
+            filename = path.join(self.directory.name,
+                                 "{}.ogg".format(index))
+            with open(filename, "wb") as media:
+                media.write(bytes([index]) * 1000)
+            uris.append(Gio.File.new_for_path(filename).get_uri())
+        keys = [self.cache.get_key(uri, 1000, 0) for uri in uris]
+        self.assertEqual(len(set(keys)), len(keys))
+        index = path.join(self.directory.name, cache.WaveformCache.INDEX)
+        with open(index) as lines:
+            entries = [json.loads(line)[0] for line in lines]
+        # Rewritten with the last MAX_INDEX_ENTRIES once it reached twice
+        # that many lines
+        self.assertEqual(entries, uris[3:])
+        waveform_cache = self.open_cache()
+        self.assertEqual(list(waveform_cache._index), uris[3:])
+        self.assertEqual(waveform_cache.get_key(uris[4], 1000, 0), keys[4])
+        # Modified media get a new fingerprint
+        with open(Gio.File.new_for_uri(uris[4]).get_path(), "wb") as media:
+            media.write(bytes(1000))
+        self.assertNotEqual(waveform_cache.get_key(uris[4], 1000, 1),
+                            keys[4])
+
+
+if __name__ == "__main__":
+    unittest.main()
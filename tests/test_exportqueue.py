@@ -0,0 +1,91 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+Licence : The script is released under GPL, uses a modified script
+     form Chromium project released under BSD license
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+import wave
+from os import path
+from tempfile import TemporaryDirectory
+
+from test_wavefile import load_module, use_settings_schema
+
+try:
+    from gi import require_version
+    require_version('Gst', '1.0')
+    from gi.repository import Gio, Gst
+    Gst.init(None)
+    exportqueue = load_module("exportqueue")
+    settings = load_module("settings")
+except (ImportError, ValueError):
+    exportqueue = None
+# Compiled schema, kept while the tests run
+SCHEMA_DIRECTORY = TemporaryDirectory()
+
+
+def setUpModule():
+    if exportqueue is not None:
+        use_settings_schema(SCHEMA_DIRECTORY.name)
+
+
+@unittest.skipIf(exportqueue is None, "GStreamer is not available")
+class TestExportQueue(unittest.TestCase):
+    """Test the export jobs are run and cancelled in order."""
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        source = path.join(self.directory.name, "source.wav")
+        with wave.open(source, "wb") as wavefile:
+            wavefile.setnchannels(1)
+            wavefile.setsampwidth(2)
+            wavefile.setframerate(8000)
+            wavefile.writeframes(bytes(16000))
+        self.uri = Gio.File.new_for_path(source).get_uri()
+        self.started = []
+        settings.Settings.get_default().export_jobs = 1
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add_job(self, queue, index):
+        output = path.join(self.directory.name, "{}.wav".format(index))
+        job = exportqueue.ExportJob(path=self.uri, output=output,
+                                    audio_format="audio/x-wav")
+        start = job.start
+
+        def record_start(slots=1):
+            self.started.append(job)
+            start(slots)
+        job.start = record_start
+        return queue.add(job)
+
+    def test_cancel_all(self):
+        """Test cancelling the queue starts none of the pending jobs."""
+        queue = exportqueue.ExportQueue()
+        jobs = [self.add_job(queue, index) for index in range(3)]
+        self.assertEqual(self.started, jobs[:1])
+        self.assertEqual(jobs[0].state, exportqueue.ExportJob.RUNNING)
+        queue.cancel_all()
+        self.assertEqual(self.started, jobs[:1])
+        for job in jobs:
+            self.assertEqual(job.state, exportqueue.ExportJob.CANCELLED)
+        for job in jobs[1:]:
+            self.assertFalse(path.exists(job.outputs[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
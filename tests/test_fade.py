@@ -0,0 +1,147 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+Licence : The script is released under GPL, uses a modified script
+     form Chromium project released under BSD license
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import numpy
+
+from test_wavefile import load_module
+
+Fade = load_module("fade").Fade
+try:
+    from gi import require_version
+    require_version('Gst', '1.0')
+    from gi.repository import Gst
+    Gst.init(None)
+    exporter = load_module("exporter")
+except (ImportError, ValueError):
+    exporter = None
+
+
+class TestFade(unittest.TestCase):
+    """Test the fade curves applied to blocks of samples."""
+
+    def setUp(self):
+        random = numpy.random.RandomState(42)
+        self.samples = random.uniform(-1, 1, (10000, 2)).astype(numpy.float32)
+
+    def test_untouched(self):
+        """Test the blocks outside of the fade windows are passed as is."""
+        fade = Fade(10000, 1000, 500)
+        self.assertFalse(fade.is_faded(1000, 8500))
+        self.assertTrue(fade.is_faded(999, 10))
+        self.assertTrue(fade.is_faded(9000, 501))
+        block = self.samples[2000:4000]
+        self.assertIs(fade.apply(block, 2000), block)
+        # Never faded out when the length is unknown
+        self.assertFalse(Fade(None, 1000, 500).is_faded(1000, 100000))
+
+    def test_blocks(self):
+        """Test fading block by block matches fading all at once."""
+        for curve in Fade.CURVES:
+            fade = Fade(10000, 3000, 2000, curve)
+            whole = fade.apply(self.samples, 0)
+            blocks = numpy.concatenate([
+                fade.apply(self.samples[first:first + 1024], first)
+                for first in range(0, 10000, 1024)])
+            numpy.testing.assert_array_equal(blocks, whole)
+            numpy.testing.assert_array_equal(whole[3000:8000],
+                                             self.samples[3000:8000])
+            self.assertTrue(numpy.all(whole[0] == 0))
+            self.assertTrue(numpy.all(whole[-1] == 0))
+
+    def test_curves(self):
+        """Test the gains of each curve."""
+        ramp = numpy.array([0.0, 0.5, 1.0])
+        numpy.testing.assert_allclose(Fade.get_curve(Fade.LINEAR, ramp),
+                                      ramp)
+        numpy.testing.assert_allclose(Fade.get_curve(Fade.EQUAL_POWER, ramp),
+                                      [0.0, numpy.sqrt(0.5), 1.0])
+        numpy.testing.assert_allclose(Fade.get_curve(Fade.LOG, ramp),
+                                      [0.0, 10 ** (-30 / 20), 1.0])
+        # Equal power fades keep the power of a crossfade constant
+        gains = Fade(1000, 500, 0, Fade.EQUAL_POWER).get_gains(0, 500)
+        numpy.testing.assert_allclose(gains ** 2 + gains[::-1] ** 2,
+                                      1.0, atol=0.02)
+        self.assertRaises(ValueError, Fade, 1000, 10, 10, "cubic")
+
+    def test_integers(self):
+        """Test integer samples are rounded and kept in range."""
+        samples = numpy.array([[-32768, 32767], [100, -100]],
+                              dtype=numpy.int16)
+        scaled = Fade.scale(samples, numpy.array([0.5, 0.25]))
+        self.assertEqual(scaled.dtype, numpy.int16)
+        numpy.testing.assert_array_equal(scaled, [[-16384, 16384],
+                                                  [25, -25]])
+        samples = numpy.array([[0, 255]], dtype=numpy.uint8)
+        numpy.testing.assert_array_equal(
+            Fade.scale(samples, numpy.array([0.0])), [[128, 128]])
+
+
+@unittest.skipIf(exporter is None, "GStreamer is not available")
+class TestFadeFilter(unittest.TestCase):
+    """Test the fade element of the export pipeline."""
+    RATE = 8000
+    BUFFER_FRAMES = 1000
+
+    def run_pipeline(self, fade=None):
+        """Return the samples of 10s of a square wave, through fade."""
+        pipeline = Gst.parse_launch(
+            "audiotestsrc wave=square num-buffers={} samplesperbuffer={} "
+            "! audio/x-raw,format=S16LE,rate={},channels=1 "
+            "! identity name=source".format(
+                10 * self.RATE // self.BUFFER_FRAMES, self.BUFFER_FRAMES,
+                self.RATE))
+        source = pipeline.get_by_name("source")
+        sink = Gst.ElementFactory.make("appsink", None)
+        sink.props.sync = False
+        pipeline.add(sink)
+        if fade is None:
+            source.link(sink)
+        else:
+            pipeline.add(fade)
+            source.link(fade)
+            fade.link(sink)
+        pipeline.set_state(Gst.State.PLAYING)
+        blocks = []
+        sample = sink.emit("pull-sample")
+        while sample is not None:
+            buffer = sample.get_buffer()
+            blocks.append(buffer.extract_dup(0, buffer.get_size()))
+            sample = sink.emit("pull-sample")
+        pipeline.set_state(Gst.State.NULL)
+        return numpy.frombuffer(b"".join(blocks),
+                                dtype="<i2").reshape(-1, 1)
+
+    def test_fades(self):
+        """Test the edges are faded and the rest pushed as is."""
+        region = exporter.ExportRegion(0, 10, "", "audio/x-wav", True, True)
+        fade = exporter.FadeFilter(region, Fade.LINEAR)
+        samples = self.run_pipeline()
+        faded = self.run_pipeline(fade)
+        self.assertEqual(len(faded), 10 * self.RATE)
+        self.assertTrue(numpy.all(faded[0] == 0))
+        self.assertTrue(numpy.all(faded[-1] == 0))
+        expected = Fade(len(samples), 3 * self.RATE, 3 * self.RATE).apply(
+            samples, 0)
+        numpy.testing.assert_array_equal(faded, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+Licence : The script is released under GPL, uses a modified script
+     form Chromium project released under BSD license
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+import os
+import wave
+from os import path
+from tempfile import TemporaryDirectory
+
+import numpy
+
+from test_wavefile import load_module
+
+PcmWave = load_module("pcmwave").PcmWave
+
+
+class TestPcmWave(unittest.TestCase):
+    """Test the byte level cuts of WAV files."""
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.source = path.join(self.directory.name, "source.wav")
+        self.output = path.join(self.directory.name, "output.wav")
+        random = numpy.random.RandomState(42)
+        self.frames = random.randint(-32768, 32768, (48000, 2),
+                                     dtype=numpy.int16)
+        with wave.open(self.source, "wb") as source:
+            source.setnchannels(2)
+            source.setsampwidth(2)
+            source.setframerate(48000)
+            source.writeframes(self.frames.tobytes())
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read_output(self):
+        with wave.open(self.output, "rb") as output:
+            self.assertEqual(output.getnchannels(), 2)
+            self.assertEqual(output.getframerate(), 48000)
+            frames = output.readframes(output.getnframes())
+        return numpy.frombuffer(frames, dtype=numpy.int16).reshape(-1, 2)
+
+    def test_parse(self):
+        """Test the format and data location are found."""
+        source = PcmWave.open(self.source)
+        self.assertEqual((source.channels, source.rate, source.bits),
+                         (2, 48000, 16))
+        self.assertEqual(source.n_frames, len(self.frames))
+        self.assertEqual(source.get_frame(500000000), 24000)
+        source.close()
+        self.assertIsNone(PcmWave.open(__file__))
+
+    def test_cut(self):
+        """Test the frames are copied as is."""
+        source = PcmWave.open(self.source)
+        self.assertTrue(source.cut(self.output, 1000, 30001))
+        source.close()
+        numpy.testing.assert_array_equal(self.read_output(),
+                                         self.frames[1000:30001])
+
+    def test_fades(self):
+        """Test only the edges are faded."""
+        source = PcmWave.open(self.source)
+        source.cut(self.output, 1000, 31000, fade_in=4800, fade_out=2400)
+        source.close()
+        frames = self.read_output()
+        expected = self.frames[1000:31000]
+        numpy.testing.assert_array_equal(frames[4800:-2400],
+                                         expected[4800:-2400])
+        self.assertTrue(numpy.all(frames[0] == 0))
+        gains = numpy.arange(4800) / 4800
+        numpy.testing.assert_allclose(frames[:4800],
+                                      expected[:4800] * gains[:, None],
+                                      atol=0.5)
+        faded = numpy.abs(frames[-2400:]) <= numpy.abs(expected[-2400:])
+        self.assertTrue(numpy.all(faded))
+
+    def test_cut_source(self):
+        """Test a cut over its own source reads it whole."""
+        source = PcmWave.open(self.source)
+        self.assertTrue(source.cut(self.source, 1000, 30001))
+        source.close()
+        self.output = self.source
+        numpy.testing.assert_array_equal(self.read_output(),
+                                         self.frames[1000:30001])
+
+    def test_join(self):
+        """Test the frames of several cuts are joined behind one header."""
+        source = PcmWave.open(self.source)
+        parts = []
+        for index, (first, last) in enumerate([(0, 10001), (10001, 48000)]):
+            part = path.join(self.directory.name, "{}.wav".format(index))
+            source.cut(part, first, last)
+            parts.append(PcmWave.open(part))
+        source.close()
+        self.assertTrue(PcmWave.join(self.output, parts))
+        for part in parts:
+            part.close()
+        numpy.testing.assert_array_equal(self.read_output(), self.frames)
+
+    def test_cancel(self):
+        """Test a cancelled cut stops."""
+        source = PcmWave.open(self.source)
+        self.assertFalse(source.cut(self.output, 0, 48000,
+                                    cancelled=lambda: True))
+        source.close()
+        self.assertFalse(path.exists(self.output))
+        self.assertEqual(os.listdir(self.directory.name), ["source.wav"])
+
+
+if __name__ == "__main__":
+    unittest.main()
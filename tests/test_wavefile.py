@@ -0,0 +1,135 @@
+"""
+Your favorite Audio Cutter.
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Artist : Alfredo Hernández
+Website : https://github.com/bil-elmoussaoui/Audio-Cutter
+Licence : The script is released under GPL, uses a modified script
+     form Chromium project released under BSD license
+This file is part of AudioCutter.
+AudioCutter is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+AudioCutter is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with AudioCutter. If not, see <http://www.gnu.org/licenses/>.
+"""
+import importlib
+import os
+import shutil
+import subprocess
+import sys
+import types
+import unittest
+from os import path
+from tempfile import TemporaryDirectory
+
+import numpy
+
+ABS_PATH = path.abspath(path.join(path.dirname(path.abspath(__file__)),
+                                  "../"))
+SCHEMA = "com.github.bilelmoussaoui.AudioCutter.gschema.xml"
+
+
+def load_module(name):
+    """Load a standalone module without importing the whole application."""
+    if "AudioCutter" not in sys.modules:
+        # Their __init__ need GTK, the relative imports only need the path
+        for package_name in ("AudioCutter", "AudioCutter.modules"):
+            package = types.ModuleType(package_name)
+            package.__path__ = [path.join(ABS_PATH,
+                                          *package_name.split("."))]
+            sys.modules[package_name] = package
+    return importlib.import_module("AudioCutter.modules.{}".format(name))
+
+
+def use_settings_schema(directory):
+    """Compile the schema in directory, the settings are kept in memory."""
+    shutil.copy(path.join(ABS_PATH, "data", SCHEMA), directory)
+    subprocess.check_call(["glib-compile-schemas", directory])
+    os.environ["GSETTINGS_SCHEMA_DIR"] = directory
+    os.environ["GSETTINGS_BACKEND"] = "memory"
+
+
+wavefile = load_module("wavefile")
+peaks = load_module("peaks")
+WaveFile = wavefile.WaveFile
+
+
+class TestWaveFile(unittest.TestCase):
+    """Test the cached waveform encodings."""
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.filename = path.join(self.directory.name, "wave")
+        random = numpy.random.RandomState(42)
+        # Long enough to span a few blocks, with silent parts
+        samples = random.rand(3 * WaveFile.BLOCK_SAMPLES + 123) ** 3
+        self.samples = (samples * 100).astype(numpy.float32)
+        self.samples[:1000] = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def save_and_open(self, encoding):
+        WaveFile.save(self.filename, self.samples, 10, 1234, 5678,
+                      encoding)
+        return WaveFile.open(self.filename)
+
+    def test_float32(self):
+        """Test float32 samples are stored as is."""
+        wave = self.save_and_open(WaveFile.ENCODING_FLOAT32)
+        self.assertEqual((wave.source_size, wave.source_mtime), (1234, 5678))
+        numpy.testing.assert_array_equal(wave.samples, self.samples)
+
+    def test_compact_accuracy(self):
+        """Test the quantization error of the compact encodings."""
+        for encoding, tolerance in ((WaveFile.ENCODING_UINT8_LOG, 0.015),
+                                    (WaveFile.ENCODING_UINT16_LOG, 0.0001)):
+            wave = self.save_and_open(encoding)
+            self.assertEqual(len(wave.samples), len(self.samples))
+            samples = numpy.asarray(wave.samples)
+            self.assertEqual(samples[0], 0)
+            # Relative to the value, plus the step just above silence
+            error = numpy.abs(samples - self.samples)
+            limit = tolerance * self.samples + tolerance / 4
+            self.assertTrue(numpy.all(error <= limit))
+            self.assertLess(os.stat(self.filename).st_size,
+                            self.samples.nbytes)
+
+    def test_compact_slices(self):
+        """Test lazily decoded slices match the whole samples."""
+        wave = self.save_and_open(WaveFile.ENCODING_UINT8_LOG)
+        samples = wave.samples
+        decoded = numpy.asarray(samples)
+        end = WaveFile.BLOCK_SAMPLES
+        for key in (slice(10, 20), slice(end - 5, end + 5),
+                    slice(0, None, 7), slice(-30, None),
+                    slice(2 * end, 10, -3), slice(50, 10)):
+            numpy.testing.assert_array_equal(samples[key], decoded[key])
+        self.assertEqual(samples[end], decoded[end])
+        self.assertEqual(samples[-1], decoded[-1])
+
+    def test_compact_pyramid(self):
+        """Test the pyramid of lazily decoded samples."""
+        wave = self.save_and_open(WaveFile.ENCODING_UINT8_LOG)
+        lazy = peaks.PeakPyramid(wave.samples)
+        full = peaks.PeakPyramid(numpy.asarray(wave.samples))
+        self.assertEqual(len(lazy.levels), len(full.levels))
+        for lazy_level, level in zip(lazy.levels[1:], full.levels[1:]):
+            numpy.testing.assert_allclose(lazy_level.mean, level.mean,
+                                          rtol=1e-6)
+
+    def test_truncated(self):
+        """Test truncated files are refused."""
+        self.save_and_open(WaveFile.ENCODING_UINT8_LOG)
+        size = os.stat(self.filename).st_size
+        os.truncate(self.filename, size - 1)
+        self.assertIsNone(WaveFile.open(self.filename))
+
+
+if __name__ == "__main__":
+    unittest.main()